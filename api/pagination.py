@@ -0,0 +1,47 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts.pagination import FEED_ORDERING, CursorPaginator
+
+
+class CursorPagination(BasePagination):
+    """
+    Курсорная пагинация API поверх posts.pagination.CursorPaginator —
+    те же токены ?after= и ?before=, что и в HTML-лентах.
+    Порядок задаётся атрибутом ordering у view.
+    """
+    page_size = 10
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'ordering', FEED_ORDERING)
+        paginator = CursorPaginator(queryset, self.get_page_size(request),
+                                    ordering)
+        self.page = paginator.get_page(
+            after=request.query_params.get('after'),
+            before=request.query_params.get('before'))
+        return list(self.page)
+
+    def _link(self, param, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'after')
+        url = remove_query_param(url, 'before')
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link('after', self.page.next_cursor),
+            'previous': self._link('before', self.page.previous_cursor),
+            'results': data,
+        })
@@ -0,0 +1,65 @@
+from rest_framework import serializers
+
+from posts.models import Comment, Follow, Group, Post
+
+
+class SparseFieldsMixin:
+    """
+    Отдаёт только поля из ?fields=id,text,...; неизвестные имена
+    пропускаются. Без параметра сериализуются все поля.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request and request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',')}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+
+class GroupSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Group
+        fields = ('id', 'title', 'slug', 'description')
+
+
+class PostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # author, group и rendition берутся из select_related в for_feed()
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+    group = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+    image = serializers.ImageField(read_only=True, use_url=True)
+    renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = ('id', 'text', 'pub_date', 'author', 'group', 'image',
+                  'thumbnail', 'renditions', 'comments_count')
+
+    def get_renditions(self, post):
+        if post.rendition is None:
+            return []
+        return post.rendition.sources()
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'post', 'author', 'text', 'created')
+
+
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field='username',
+                                        read_only=True)
+    author = serializers.SlugRelatedField(slug_field='username',
+                                          read_only=True)
+
+    class Meta:
+        model = Follow
+        fields = ('id', 'user', 'author')
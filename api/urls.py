@@ -0,0 +1,15 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from api import views
+
+router = DefaultRouter()
+router.register('posts', views.PostViewSet, basename='posts')
+router.register(r'posts/(?P<post_id>\d+)/comments', views.CommentViewSet,
+                basename='comments')
+router.register('groups', views.GroupViewSet, basename='groups')
+router.register('follows', views.FollowViewSet, basename='follows')
+
+urlpatterns = [
+    path('v1/', include(router.urls)),
+]
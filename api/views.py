@@ -0,0 +1,108 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, status, viewsets
+from rest_framework.response import Response
+
+from api.serializers import CommentSerializer, FollowSerializer, \
+    GroupSerializer, PostSerializer
+from posts import caching
+from posts.models import Comment, Follow, Group, Post
+from posts.pagination import FEED_ORDERING
+
+
+class ConditionalMixin:
+    """
+    ETag строится из версий пространств имён posts.caching, поэтому
+    проверить If-None-Match можно без запросов к базе: если версии не
+    изменились, клиент получает 304 и пустое тело.
+    """
+
+    def etag_namespaces(self):
+        raise NotImplementedError
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        tag = caching.etag(request, f'api:{self.basename}:{self.action}',
+                           self.etag_namespaces())
+        if tag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = tag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+
+class PostViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Посты от новых к старым. ?group=<slug> и ?author=<username>
+    повторяют ленты группы и профиля.
+    """
+    serializer_class = PostSerializer
+    ordering = FEED_ORDERING
+
+    def get_queryset(self):
+        queryset = Post.objects.for_feed()
+        group = self.request.query_params.get('group')
+        author = self.request.query_params.get('author')
+        if group:
+            queryset = queryset.filter(group__slug=group)
+        if author:
+            queryset = queryset.filter(author__username=author)
+        return queryset
+
+    def etag_namespaces(self):
+        if self.action == 'retrieve':
+            return [caching.post_ns(self.kwargs['pk'])]
+        group = self.request.query_params.get('group')
+        author = self.request.query_params.get('author')
+        namespaces = []
+        if group:
+            namespaces.append(caching.group_ns(group))
+        if author:
+            namespaces.append(caching.author_ns(author))
+        return namespaces or [caching.INDEX]
+
+
+class GroupViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    lookup_field = 'slug'
+    ordering = ('id',)
+
+    def etag_namespaces(self):
+        # сохранение группы увеличивает версию главной ленты
+        return [caching.INDEX]
+
+
+class CommentViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = CommentSerializer
+    # тот же порядок, что на странице поста (индекс post, created, id)
+    ordering = ('created', 'id')
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        return post.comments.select_related('author')
+
+    def etag_namespaces(self):
+        return [caching.post_ns(self.kwargs['post_id'])]
+
+
+class FollowViewSet(ConditionalMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Подписки текущего пользователя.
+    """
+    serializer_class = FollowSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    ordering = ('-id',)
+
+    def get_queryset(self):
+        return Follow.objects.filter(user=self.request.user) \
+            .select_related('user', 'author')
+
+    def etag_namespaces(self):
+        return [caching.follow_ns(self.request.user.pk)]
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from posts import search, thumbnails
 from posts.models import Post, Group, Follow
 
 
@@ -12,6 +13,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"  # это свойство сработает для всех колонок: где пусто - там будет эта строка
 
+    def get_search_results(self, request, queryset, search_term):
+        # ищем по полнотекстовому индексу, а не LIKE '%...%' по таблице
+        if not search_term:
+            return queryset, False
+        ids = search.matching_ids(search_term)
+        return queryset.filter(id__in=ids), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(obj)
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
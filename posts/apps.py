@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # подключаем обработчики сигналов моделей
+        from posts import signals  # noqa: F401
+
+        # прагмы SQLite для каждого нового соединения
+        from django.db.backends.signals import connection_created
+
+        from yatube.db import configure_sqlite
+        connection_created.connect(configure_sqlite,
+                                   dispatch_uid='yatube_sqlite_pragmas')
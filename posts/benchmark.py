@@ -0,0 +1,337 @@
+"""
+Нагрузочный прогон страниц сайта.
+
+Страницы запрашиваются через тестовый клиент Django (в том же процессе,
+со всеми middleware и кэшем) или через настоящий HTTP к локальному
+WSGI-серверу. Для каждого сценария считаются перцентили времени ответа,
+число запросов к базе на страницу и пропускная способность. Результат —
+словарь, который сохраняется в JSON и сравнивается с прошлыми прогонами.
+"""
+import math
+import platform
+import threading
+import time
+import urllib.request
+from urllib.parse import quote
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (OperationalError, connection, connections,
+                       transaction)
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.pagination import FEED_ORDERING, CursorPaginator
+from yatube import db
+
+
+def percentile(values, percent):
+    """
+    Перцентиль методом ближайшего ранга.
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, queries, elapsed):
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(ms),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'mean_ms': round(sum(ms) / len(ms), 2),
+        'max_ms': round(max(ms), 2),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'throughput_rps': round(len(ms) / elapsed, 1),
+    }
+
+
+def scenarios(deep_offset=1000):
+    """
+    Адреса для прогона, выбранные по данным в базе: самая большая
+    группа, самый активный автор, самый обсуждаемый пост и самый
+    подписанный читатель. Возвращает список (имя, url, пользователь),
+    где пользователь — под кем заходить, или None.
+    """
+    result = [('index', '/', None)]
+    feed = Post.objects.order_by(*FEED_ORDERING)
+    deep = next(iter(feed[deep_offset:deep_offset + 1]), None)
+    if deep is not None:
+        cursor = CursorPaginator(feed, 10).cursor_for(deep)
+        result.append(('index_deep', f'/?after={cursor}', None))
+    group = _largest_group()
+    if group is not None:
+        result.append(('group', f'/group/{group.slug}/', None))
+    author = _top('posts_count')
+    if author is not None:
+        result.append(('profile', f'/{author.username}/', None))
+    post = Post.objects.select_related('author') \
+        .order_by('-comments_count').first()
+    if post is not None:
+        result.append(('post',
+                       f'/{post.author.username}/{post.id}/', None))
+    reader = _top('following_count')
+    if reader is not None and Follow.objects.filter(user=reader).exists():
+        result.append(('follow_index', '/follow/', reader))
+    if Post.objects.exists():
+        word = Post.objects.order_by('id').values_list(
+            'text', flat=True).first().split()[0]
+        result.append(('search', f'/search/?q={quote(word)}', None))
+    return result
+
+
+def _largest_group():
+    return Group.objects.annotate(size=Count('posts')) \
+        .order_by('-size').first()
+
+
+def _top(field):
+    stats = UserStats.objects.select_related('user') \
+        .order_by(f'-{field}').first()
+    return stats.user if stats else None
+
+
+class InProcessRunner:
+    """
+    Запросы через django.test.Client: без сети, но со всем стеком
+    middleware и шаблонов. Запросы к базе считаются напрямую.
+    """
+
+    def __init__(self):
+        self.clients = {}
+
+    def client_for(self, user):
+        key = getattr(user, 'pk', None)
+        if key not in self.clients:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            self.clients[key] = client
+        return self.clients[key]
+
+    def get(self, url, user):
+        client = self.client_for(user)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} вернул {response.status_code}')
+        return elapsed, len(captured)
+
+    def close(self):
+        pass
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WSGIRunner(InProcessRunner):
+    """
+    Поднимает wsgiref-сервер с приложением проекта в соседнем потоке и
+    ходит к нему по HTTP. Запросы к базе считаются в потоке сервера.
+    """
+
+    def __init__(self):
+        super().__init__()
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+
+        def counting(environ, start_response):
+            count = [0]
+
+            def wrapper(execute, sql, params, many, context):
+                count[0] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(wrapper):
+                body = b''.join(application(environ, start_response))
+            # запросы идут по одному, поэтому клиент прочитает число
+            # сразу после ответа
+            self.last_queries = count[0]
+            return [body]
+
+        self.server = make_server('127.0.0.1', 0, counting,
+                                  handler_class=_QuietHandler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        self.last_queries = 0
+
+    def get(self, url, user):
+        headers = {}
+        if user is not None:
+            # сессию создаёт тестовый клиент, сервер читает её из базы
+            name = settings.SESSION_COOKIE_NAME
+            session = self.client_for(user).cookies[name]
+            headers['Cookie'] = f'{name}={session.value}'
+        request = urllib.request.Request(self.base_url + url, headers=headers)
+        started = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return time.perf_counter() - started, self.last_queries
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(runner, requests=200, warmup=20, cold=False, only=None):
+    """
+    Прогоняет сценарии и возвращает результаты для сохранения в JSON.
+    cold=True сбрасывает кэш перед каждым запросом, чтобы измерить
+    построение страниц, а не отдачу из кэша.
+    """
+    results = {}
+    for name, url, user in scenarios():
+        if only and name not in only:
+            continue
+        for _ in range(warmup):
+            runner.get(url, user)
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            latency, count = runner.get(url, user)
+            latencies.append(latency)
+            queries.append(count)
+        results[name] = dict(url=url, **summarize(
+            latencies, queries, time.perf_counter() - started))
+    return {'meta': _meta(runner=type(runner).__name__, cold=cold),
+            'scenarios': results}
+
+
+def _meta(**extra):
+    meta = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'cache': settings.CACHES['default']['BACKEND'],
+        'rows': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+    }
+    if connection.vendor == 'sqlite':
+        meta['sqlite'] = db.pragmas(connection)
+    meta.update(extra)
+    return meta
+
+
+def _read(post):
+    list(Post.objects.for_feed().order_by(*FEED_ORDERING)[:10])
+    list(Comment.objects.filter(post=post).select_related('author')[:50])
+
+
+def _write(post, author, created):
+    # комментарий и счётчики из сигналов — одной транзакцией, чтобы
+    # ошибка блокировки не оставляла комментарий без учёта
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post, author=author, text='Комментарий нагрузочного теста')
+    created.append(comment.pk)
+
+
+def _worker(operation, deadline, latencies, queries, errors):
+    count = [0]
+
+    def counting(execute, sql, params, many, context):
+        count[0] += 1
+        return execute(sql, params, many, context)
+
+    try:
+        with connection.execute_wrapper(counting):
+            while time.perf_counter() < deadline:
+                count[0] = 0
+                started = time.perf_counter()
+                try:
+                    operation()
+                except OperationalError:
+                    # «database is locked»: писатель не дождался очереди
+                    errors.append(time.perf_counter() - started)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                queries.append(count[0])
+    finally:
+        # у каждого потока своё соединение
+        connections.close_all()
+
+
+def concurrent(readers=4, writers=2, duration=5.0):
+    """
+    Смешанная нагрузка в потоках: читатели выбирают первую страницу
+    ленты и комментарии самого обсуждаемого поста, писатели добавляют к
+    нему комментарии. Показывает, насколько запись мешает чтению при
+    текущих прагмах SQLite (settings.SQLITE_PRAGMAS). Добавленные
+    комментарии в конце удаляются.
+    """
+    post = Post.objects.order_by('-comments_count').first()
+    author = User.objects.order_by('id').first()
+    if post is None:
+        raise RuntimeError('В базе нет постов, см. generate_data')
+    created = []
+    kinds = {
+        'concurrent_read': (readers, lambda: _read(post)),
+        'concurrent_write': (writers, lambda: _write(post, author, created)),
+    }
+    samples = {name: ([], [], []) for name in kinds}
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_worker,
+                         args=(operation, deadline, *samples[name]))
+        for name, (count, operation) in kinds.items()
+        for _ in range(count)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name, (latencies, queries, errors) in samples.items():
+        if latencies:
+            results[name] = summarize(latencies, queries, elapsed)
+        else:
+            results[name] = {'requests': 0}
+        results[name]['errors'] = len(errors)
+    Comment.objects.filter(pk__in=created).delete()
+    return {'meta': _meta(runner='concurrent', readers=readers,
+                          writers=writers, duration=duration),
+            'scenarios': results}
+
+
+def compare(baseline, current, metrics=('p50_ms', 'p95_ms', 'p99_ms',
+                                         'queries_mean', 'throughput_rps',
+                                         'errors')):
+    """
+    Строки сравнения двух прогонов: значение и изменение в процентах.
+    """
+    lines = []
+    for name, result in current['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        parts = []
+        for metric in metrics:
+            if metric not in old or metric not in result:
+                continue
+            before, after = old[metric], result[metric]
+            change = (after - before) / before * 100 if before else 0
+            parts.append(f'{metric} {before} → {after} ({change:+.0f}%)')
+        lines.append(f'{name}: ' + ', '.join(parts))
+    return lines
@@ -0,0 +1,262 @@
+"""
+Кэш страниц с версиями вместо фиксированного времени жизни.
+
+Каждая страница зависит от набора «пространств имён» (лента всех постов,
+группа, автор, пост, лента подписок). Ключ кэша содержит текущие версии
+этих пространств, а сигналы моделей увеличивают версии при изменениях.
+Старые ключи просто перестают запрашиваться и вытесняются сами, поэтому
+страницы можно хранить часами и не показывать устаревшее содержимое.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from yatube import routers
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 6)
+REPLICA_PAGE_CACHE_TIMEOUT = getattr(settings, 'REPLICA_PAGE_CACHE_TIMEOUT',
+                                     60)
+# Пока страница строится, остальные запросы за ней ждут не дольше
+# LOCK_WAIT секунд, а не строят её параллельно.
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 3
+LOCK_POLL_INTERVAL = 0.05
+
+INDEX = 'index'
+CELEBRITIES = 'celebrities'
+# оценки популярного, пересчитанные posts.trending.rebuild
+TRENDING = 'trending'
+# выход любого пользователя: меняет Last-Modified анонимных страниц
+LOGOUTS = 'logouts'
+
+
+def group_ns(slug):
+    return f'group:{slug}'
+
+
+def author_ns(username):
+    return f'author:{username}'
+
+
+def post_ns(post_id):
+    return f'post:{post_id}'
+
+
+def follow_ns(user_id):
+    return f'follow:{user_id}'
+
+
+def feed_ns(author_id):
+    # посты автора в лентах подписок: от него зависят ленты всех его
+    # подписчиков, и они узнают об этом при чтении, а не при записи
+    return f'feed:{author_id}'
+
+
+def suggestions_ns(user_id):
+    # рекомендации «кого почитать», см. posts.recommendations
+    return f'suggestions:{user_id}'
+
+
+def user_ns(user_id):
+    # вход и выход пользователя, см. http_modified
+    return f'user:{user_id}'
+
+
+def pending_ns(post_id, user_id):
+    # комментарии пользователя к посту, ждущие в posts.comment_queue
+    return f'pending:{post_id}:{user_id}'
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _modified_key(namespace):
+    return f'modified:{namespace}'
+
+
+def _initial_version():
+    # Версия, созданная заново после вытеснения из кэша, не должна
+    # совпасть ни с одной из прежних, поэтому начинаем со времени.
+    return time.time_ns() // 1000
+
+
+def get_versions(namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*namespaces):
+    """
+    Делает недействительными все страницы, зависящие от namespaces.
+    """
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({_modified_key(namespace): now
+                    for namespace in namespaces}, None)
+
+
+def last_modified(namespaces):
+    """
+    Время последнего изменения любого из namespaces. Для пространства
+    без отметки (новое или вытесненное из кэша) берётся текущее время —
+    так клиент в худшем случае один раз получит страницу целиком.
+    """
+    keys = [_modified_key(namespace) for namespace in namespaces]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, time.time(), None)
+            stamps[key] = cache.get(key)
+    return max(stamps.values())
+
+
+def http_modified(request, namespaces):
+    """
+    Last-Modified страницы в целых секундах и можно ли его отдать.
+
+    Время округляется вверх, но отдаётся, только когда эта секунда уже
+    прошла: иначе изменение в ту же секунду получило бы то же значение,
+    и клиент с If-Modified-Since остался бы со старой страницей. В
+    отличие от ETag, время не зависит от пользователя, поэтому к
+    namespaces добавляется отметка входа и выхода: после смены
+    пользователя страница не подтверждается старой копией.
+    """
+    identity = (user_ns(request.user.pk) if request.user.is_authenticated
+                else LOGOUTS)
+    stamp = math.floor(last_modified([*namespaces, identity])) + 1
+    return stamp, stamp <= time.time()
+
+
+def page_key(request, view_name, namespaces):
+    # лента подписок зависит от пространства каждого автора, поэтому
+    # версии, как и путь, хешируются: ключ не растёт с их числом
+    versions = hashlib.md5('.'.join(
+        str(v) for v in get_versions(namespaces)).encode()).hexdigest()
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    user_id = request.user.pk or 0
+    return f'page:{view_name}:{path}:{user_id}:{versions}'
+
+
+def etag(request, view_name, namespaces):
+    """
+    ETag ответа, который зависит только от namespaces: пока их версии
+    не изменились, содержимое то же, и его не нужно строить заново.
+    """
+    return _etag_for(page_key(request, view_name, namespaces))
+
+
+def _etag_for(key):
+    return '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+def get_or_build(key, build, timeout=PAGE_CACHE_TIMEOUT,
+                 cacheable=lambda value: True):
+    """
+    Возвращает значение из кэша или строит его, защищаясь от «лавины»:
+    холодный ключ строит только тот, кто первым взял блокировку, а
+    остальные ждут результат. Если строящий отказался кэшировать
+    результат или не успел за LOCK_WAIT, ожидающие строят сами.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock_key = f'lock:{key}'
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if not cache.has_key(lock_key):
+                break
+    try:
+        value = build()
+        if cacheable(value):
+            cache.set(key, value, timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+def _cacheable_response(request):
+    def check(response):
+        # страницы с формами и куками привязаны к сессии — не кэшируем
+        return (response.status_code == 200 and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED'))
+    return check
+
+
+def _build(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    # отметка сохраняется вместе с ответом в кэше
+    response.built_on_replica = routers.reading_replica()
+    return response
+
+
+def versioned_page(namespaces_for):
+    """
+    Кэширует ответ view. namespaces_for(request, **kwargs) возвращает
+    пространства имён, от которых зависит страница.
+
+    Ответ получает ETag и Last-Modified (см. http_modified) из тех же
+    версий, поэтому на
+    If-None-Match и If-Modified-Since отвечаем 304 ещё до шаблонов и
+    запросов к базе. Страница, построенная по реплике, может отставать
+    от этих версий, поэтому её клиент получает без ETag и Last-Modified
+    и не сможет подтверждать устаревшую копию через 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            namespaces = namespaces_for(request, *args, **kwargs)
+            key = page_key(request, view.__name__, namespaces)
+            tag = _etag_for(key)
+            modified, settled = http_modified(request, namespaces)
+            response = get_conditional_response(
+                request, etag=tag, last_modified=modified)
+            if response is None:
+                # реплика может отставать: иначе устаревшая страница
+                # осталась бы в кэше под новой версией надолго
+                timeout = (REPLICA_PAGE_CACHE_TIMEOUT
+                           if routers.reading_replica()
+                           else PAGE_CACHE_TIMEOUT)
+                response = get_or_build(
+                    key,
+                    lambda: _build(view, request, *args, **kwargs),
+                    timeout=timeout,
+                    cacheable=_cacheable_response(request),
+                )
+            if getattr(response, 'built_on_replica', False):
+                patch_cache_control(response, private=True, no_cache=True)
+            elif response.status_code in (200, 304):
+                response['ETag'] = tag
+                if settled:
+                    response['Last-Modified'] = http_date(modified)
+                # страница зависит от пользователя, и её нужно
+                # перепроверять при каждом показе
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
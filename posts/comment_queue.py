@@ -0,0 +1,239 @@
+"""
+Приём комментариев через очередь (write-behind).
+
+При COMMENT_INGESTION = 'queue' add_comment не пишет в основную базу, а
+добавляет комментарий в отдельный файл SQLite (COMMENT_QUEUE_PATH):
+у него своя блокировка записи, поэтому всплеск комментариев к горячему
+посту не задерживает ни чтение лент, ни другие записи. Фоновый поток
+(или команда drain_comments) переносит очередь в базу порциями через
+bulk_create и делает то же, что сигналы Comment: счётчики, оценку
+популярного и сброс кэша.
+
+Пока комментарий в очереди, автор видит его на странице поста
+(pending), остальные — после переноса.
+
+Порция сначала помечается как взятая, затем записывается в базу и
+только потом удаляется из очереди. Если перенос прервался, через
+CLAIM_TIMEOUT порцию возьмут снова. У каждой строки очереди есть
+случайный token, он сохраняется в Comment.queue_token (уникальное поле),
+поэтому уже записанные комментарии не задвоятся, а такой же текст,
+отправленный тем же автором ещё раз, не примется за повтор. Время
+комментария — время постановки в очередь, а не переноса.
+"""
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connections, router, \
+    transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, counters, trending
+from posts.models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# через сколько секунд взятая, но не удалённая порция считается брошенной
+CLAIM_TIMEOUT = 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS comment_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    queued TEXT NOT NULL,
+    claimed REAL,
+    token TEXT
+);
+CREATE INDEX IF NOT EXISTS comment_queue_pending
+    ON comment_queue (post_id, author_id);
+'''
+
+_local = threading.local()
+_drainer = None
+_drainer_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'COMMENT_INGESTION', 'sync') == 'queue'
+
+
+def _connection():
+    # у каждого потока своё соединение с файлом очереди
+    path = settings.COMMENT_QUEUE_PATH
+    opened = _local.__dict__.setdefault('connections', {})
+    if path not in opened:
+        db = sqlite3.connect(path, timeout=5, isolation_level=None)
+        db.execute('PRAGMA journal_mode = WAL')
+        # принятый комментарий не должен пропасть и при отключении питания
+        db.execute('PRAGMA synchronous = FULL')
+        db.executescript(SCHEMA)
+        _upgrade(db)
+        opened[path] = db
+    return opened[path]
+
+
+def _upgrade(db):
+    # очереди, созданные до появления token
+    columns = {row[1] for row in db.execute(
+        'PRAGMA table_info(comment_queue)')}
+    if 'token' not in columns:
+        db.execute('ALTER TABLE comment_queue ADD COLUMN token TEXT')
+    db.execute('UPDATE comment_queue SET token = lower(hex(randomblob(16))) '
+               'WHERE token IS NULL')
+
+
+def enqueue(post, author, text):
+    """
+    Ставит комментарий в очередь и возвращает несохранённый Comment.
+    """
+    queued = timezone.now()
+    _connection().execute(
+        'INSERT INTO comment_queue (post_id, author_id, text, queued, token) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (post.pk, author.pk, text, queued.isoformat(), uuid.uuid4().hex))
+    caching.bump(caching.pending_ns(post.pk, author.pk))
+    _start_drainer()
+    return Comment(post=post, author=author, text=text, created=queued)
+
+
+def pending(post_id, author):
+    """
+    Комментарии автора к посту, которые ещё ждут переноса в базу.
+    """
+    rows = _connection().execute(
+        'SELECT text, queued FROM comment_queue '
+        'WHERE post_id = ? AND author_id = ? ORDER BY id',
+        (post_id, author.pk))
+    return [Comment(post_id=post_id, author=author, text=text,
+                    created=parse_datetime(queued))
+            for text, queued in rows]
+
+
+def _claim(batch_size):
+    db = _connection()
+    now = time.time()
+    # IMMEDIATE: два переносчика не возьмут одну порцию
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        rows = db.execute(
+            'SELECT id, post_id, author_id, text, queued, claimed, token '
+            'FROM comment_queue WHERE claimed IS NULL OR claimed < ? '
+            'ORDER BY id LIMIT ?', (now - CLAIM_TIMEOUT, batch_size)
+        ).fetchall()
+        db.executemany('UPDATE comment_queue SET claimed = ? WHERE id = ?',
+                       [(now, row[0]) for row in rows])
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    return rows
+
+
+def _already_stored(rows):
+    """
+    token комментариев из повторно взятых порций, которые прерванный
+    перенос успел записать.
+    """
+    retried = [row[6] for row in rows if row[5] is not None]
+    if not retried:
+        return set()
+    return set(Comment.objects.filter(queue_token__in=retried).values_list(
+        'queue_token', flat=True))
+
+
+def _insert(comments):
+    """
+    Записывает комментарии со временем из очереди: bulk_create
+    подставил бы в created текущее время (auto_now_add).
+    """
+    connection = connections[router.db_for_write(Comment)]
+    quote = connection.ops.quote_name
+    fields = [Comment._meta.get_field(name) for name in
+              ('post', 'author', 'text', 'created', 'queue_token')]
+    columns = ', '.join(quote(field.column) for field in fields)
+    sql = (f'INSERT INTO {quote(Comment._meta.db_table)} ({columns}) '
+           f'VALUES ({", ".join(["%s"] * len(fields))})')
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection)
+             for field, value in zip(fields, comment)]
+            for comment in comments])
+
+
+def _store(rows):
+    skip = _already_stored(rows)
+    # пост или автора могли удалить, пока комментарий ждал
+    posts = set(Post.objects.filter(
+        id__in={row[1] for row in rows}).values_list('id', flat=True))
+    users = set(get_user_model().objects.filter(
+        id__in={row[2] for row in rows}).values_list('id', flat=True))
+    comments = [(post_id, author_id, text, parse_datetime(queued), token)
+                for _, post_id, author_id, text, queued, _, token in rows
+                if token not in skip and post_id in posts
+                and author_id in users]
+    per_post = defaultdict(list)
+    for post_id, _, _, created, _ in comments:
+        per_post[post_id].append(created)
+    with transaction.atomic():
+        _insert(comments)
+        for post_id, created in per_post.items():
+            counters.change_post_comments(post_id, len(created))
+            trending.comments_added(post_id, *created)
+    return {post_id: len(created) for post_id, created in per_post.items()}
+
+
+def drain(batch_size=BATCH_SIZE):
+    """
+    Переносит очередь в базу и возвращает число записанных комментариев.
+    """
+    from posts.signals import invalidate_post
+
+    total = 0
+    while True:
+        rows = _claim(batch_size)
+        if not rows:
+            return total
+        per_post = _store(rows)
+        ids = [row[0] for row in rows]
+        _connection().execute(
+            'DELETE FROM comment_queue WHERE id IN ({})'.format(
+                ', '.join('?' * len(ids))), ids)
+        # кэш сбрасываем после удаления из очереди, чтобы новая версия
+        # страницы не показала комментарий дважды
+        for post in Post.objects.filter(
+                id__in=per_post).select_related('author'):
+            invalidate_post(post)
+        total += sum(per_post.values())
+
+
+def _drain_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            drain()
+        except Exception:
+            logger.exception('Не удалось перенести очередь комментариев')
+        finally:
+            close_old_connections()
+
+
+def _start_drainer():
+    global _drainer
+    interval = getattr(settings, 'COMMENT_DRAIN_INTERVAL', 1.0)
+    if interval is None or _drainer is not None:
+        return
+    with _drainer_lock:
+        if _drainer is None:
+            _drainer = threading.Thread(
+                target=_drain_forever, args=(interval,),
+                name='comment-drainer', daemon=True)
+            _drainer.start()
@@ -0,0 +1,187 @@
+"""
+Денормализованные счётчики: подписчики, подписки и посты пользователя
+(UserStats), посты группы (Group.posts_count) и комментарии поста
+(Post.comments_count).
+
+Счётчики меняются одним UPDATE с F-выражением, поэтому одновременные
+запросы не теряют изменения и не уходят ниже нуля. Если строки UserStats
+ещё нет, она создаётся пересчётом, так что счётчики сами
+восстанавливаются — кроме пользователей, которых сейчас удаляют: при
+каскадном удалении их UserStats уже стёрта, и пересоздавать её нельзя.
+"""
+import threading
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+# id пользователей, каскадное удаление которых идёт в этом потоке
+_deleting = threading.local()
+
+
+def _deleting_ids():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def user_deleting(user_id):
+    _deleting_ids().add(user_id)
+
+
+def user_deleted(user_id):
+    _deleting_ids().discard(user_id)
+
+
+def is_deleting(user_id):
+    return user_id in _deleting_ids()
+
+
+def recount_user(user_id):
+    return {
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+    }
+
+
+def stats_for(user):
+    try:
+        return UserStats.objects.get(user_id=user.pk)
+    except UserStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(user_id=user.pk,
+                                            **recount_user(user.pk))
+    except IntegrityError:
+        # строку уже создали, но реплика могла её ещё не получить
+        return UserStats.objects.using(
+            router.db_for_write(UserStats)).get(user_id=user.pk)
+
+
+def change_user(user_id, **deltas):
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)
+           for field, delta in deltas.items()})
+    if not updated and not is_deleting(user_id):
+        # пересчёт уже учитывает изменение, которое вызвало сигнал
+        try:
+            with transaction.atomic():
+                UserStats.objects.create(user_id=user_id,
+                                         **recount_user(user_id))
+        except IntegrityError:
+            change_user(user_id, **deltas)
+
+
+def shift(field, user_ids, delta):
+    """
+    Меняет счётчик field у нескольких пользователей одним UPDATE ...
+    RETURNING (SQLite 3.35+, PostgreSQL) и возвращает новые значения
+    {user_id: значение} без лишних запросов. Недостающие строки
+    UserStats создаются пересчётом, как в change_user.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    connection = connections[router.db_for_write(UserStats)]
+    quote = connection.ops.quote_name
+    table = quote(UserStats._meta.db_table)
+    column = quote(UserStats._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {column} = CASE WHEN {column} + %s > 0 '
+            f'THEN {column} + %s ELSE 0 END '
+            f'WHERE user_id IN ({placeholders}) '
+            f'RETURNING user_id, {column}', [delta, delta, *user_ids])
+        values = dict(cursor.fetchall())
+    for user_id in user_ids - set(values):
+        values[user_id] = getattr(stats_for(User(pk=user_id)), field)
+    return values
+
+
+def change_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=Greatest(F('posts_count') + delta, 0))
+
+
+def total_posts():
+    """
+    Число всех постов по счётчикам авторов: строк UserStats намного
+    меньше, чем постов, и COUNT(*) по всей таблице постов не нужен.
+    """
+    return UserStats.objects.aggregate(
+        total=Sum('posts_count'))['total'] or 0
+
+
+def _totals(queryset, field):
+    return dict(queryset.order_by().values(field).annotate(
+        total=Count('id')).values_list(field, 'total'))
+
+
+def repair():
+    """
+    Пересчитывает все счётчики одним проходом по агрегатам и исправляет
+    разошедшиеся. Пользователям с ненулевыми счётчиками, у которых нет
+    строки UserStats (например, после массовой загрузки), она создаётся.
+    Возвращает число исправленных и созданных строк.
+    """
+    fixed = 0
+    with transaction.atomic():
+        comments = _totals(Comment.objects, 'post')
+        changed = []
+        for post in Post.objects.only('id', 'comments_count').iterator():
+            actual = comments.get(post.id, 0)
+            if post.comments_count != actual:
+                post.comments_count = actual
+                changed.append(post)
+        Post.objects.bulk_update(changed, ['comments_count'], batch_size=500)
+        fixed += len(changed)
+
+        posts = _totals(Post.objects, 'group')
+        changed = []
+        for group in Group.objects.only('id', 'posts_count'):
+            actual = posts.get(group.id, 0)
+            if group.posts_count != actual:
+                group.posts_count = actual
+                changed.append(group)
+        Group.objects.bulk_update(changed, ['posts_count'], batch_size=500)
+        fixed += len(changed)
+
+        actual = {
+            'followers_count': _totals(Follow.objects, 'author'),
+            'following_count': _totals(Follow.objects, 'user'),
+            'posts_count': _totals(Post.objects, 'author'),
+        }
+        changed = []
+        for stats in UserStats.objects.iterator():
+            drift = False
+            for field, totals in actual.items():
+                value = totals.get(stats.user_id, 0)
+                if getattr(stats, field) != value:
+                    setattr(stats, field, value)
+                    drift = True
+            if drift:
+                changed.append(stats)
+        UserStats.objects.bulk_update(changed, list(actual), batch_size=500)
+        fixed += len(changed)
+
+        missing = set().union(*actual.values()) - set(
+            UserStats.objects.values_list('user_id', flat=True))
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id, **{
+                field: totals.get(user_id, 0)
+                for field, totals in actual.items()})
+             for user_id in missing],
+            batch_size=500)
+        fixed += len(missing)
+    return fixed
@@ -0,0 +1,236 @@
+"""
+Выгрузка и загрузка данных сайта в формате NDJSON: одна запись JSON на
+строку, поле "type" — вид записи. Файл читается и пишется потоком,
+поэтому размер дампа не ограничен памятью.
+
+Записи идут в порядке users, groups, posts, comments, follows, чтобы
+ссылки указывали на уже загруженные объекты. Пользователи и группы
+связываются по username и slug, посты и комментарии сохраняют свои id.
+"""
+import json
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, recommendations, search, timeline, trending
+from posts.models import Comment, Follow, Group, Post, User
+
+RECORD_TYPES = ('user', 'group', 'post', 'comment', 'follow')
+# SQLite ограничивает число параметров в одном запросе
+SQL_BATCH = 500
+
+EXPORT_FIELDS = {
+    'user': (User.objects.order_by('id'), {
+        'username': 'username', 'email': 'email',
+        'first_name': 'first_name', 'last_name': 'last_name',
+        'password': 'password', 'is_active': 'is_active',
+        'date_joined': 'date_joined',
+    }),
+    'group': (Group.objects.order_by('id'), {
+        'slug': 'slug', 'title': 'title', 'description': 'description',
+    }),
+    'post': (Post.objects.order_by('id'), {
+        'id': 'id', 'author': 'author__username', 'group': 'group__slug',
+        'text': 'text', 'image': 'image', 'pub_date': 'pub_date',
+    }),
+    'comment': (Comment.objects.order_by('id'), {
+        'id': 'id', 'post': 'post_id', 'author': 'author__username',
+        'text': 'text', 'created': 'created',
+    }),
+    'follow': (Follow.objects.order_by('id'), {
+        'user': 'user__username', 'author': 'author__username',
+    }),
+}
+
+
+def _chunks(items, size=SQL_BATCH):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def export(stream, batch_size=1000, progress=None):
+    """
+    Пишет все записи в stream (бинарный файл). values() с iterator()
+    не создаёт модели и не держит всю таблицу в памяти.
+    progress(kind, count) вызывается после каждой порции.
+    """
+    counts = Counter()
+    for kind in RECORD_TYPES:
+        queryset, fields = EXPORT_FIELDS[kind]
+        rows = queryset.values_list(*fields.values())
+        for row in rows.iterator(chunk_size=batch_size):
+            record = {'type': kind}
+            record.update(zip(fields, row))
+            stream.write(json.dumps(record, ensure_ascii=False,
+                                    default=str).encode() + b'\n')
+            counts[kind] += 1
+            if progress and counts[kind] % batch_size == 0:
+                progress(kind, counts[kind])
+        if progress:
+            progress(kind, counts[kind])
+    return counts
+
+
+def rebuild_derived():
+    """
+    bulk_create не отправляет сигналы, поэтому после массовой записи
+    счётчики, ленты, поисковый индекс, рекомендации и оценки популярного
+    пересчитываются целиком, а кэш страниц сбрасывается.
+    """
+    counters.repair()
+    timeline.rebuild()
+    trending.rebuild()
+    search.rebuild()
+    recommendations.build()
+    cache.clear()
+
+
+@contextmanager
+def original_timestamps():
+    """
+    auto_now_add и auto_now перезаписали бы даты из дампа текущим
+    временем, поэтому на время загрузки они выключаются.
+    """
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('edited'),
+              Comment._meta.get_field('created')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """
+    Загружает NDJSON порциями через bulk_create. Порция пишется в одной
+    транзакции, после неё вызывается checkpoint(offset) с позицией в
+    файле, с которой можно продолжить после сбоя. Повторная загрузка
+    уже записанной порции ничего не дублирует: вставка идёт с
+    ignore_conflicts по уникальным полям и id.
+    """
+
+    def __init__(self, batch_size=1000, progress=None, checkpoint=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.checkpoint = checkpoint
+        self.counts = Counter()
+        self.skipped = Counter()
+        # username -> id и slug -> id, чтобы не искать их на каждую запись
+        self.user_ids = {}
+        self.group_ids = {}
+
+    def run(self, stream, offset=0):
+        stream.seek(offset)
+        kind, batch = None, []
+        with original_timestamps():
+            for line in stream:
+                record = json.loads(line) if line.strip() else None
+                if record is not None and (
+                        record.get('type') != kind
+                        or len(batch) >= self.batch_size):
+                    self.flush(kind, batch, offset)
+                    kind, batch = record.get('type'), []
+                offset += len(line)
+                if record is not None:
+                    batch.append(record)
+            self.flush(kind, batch, offset)
+        return self.counts
+
+    def flush(self, kind, records, offset):
+        if records:
+            if kind not in RECORD_TYPES:
+                raise ValueError(f'Неизвестный тип записи: {kind!r}')
+            model = EXPORT_FIELDS[kind][0].model
+            with transaction.atomic():
+                objects = getattr(self, f'build_{kind}s')(records)
+                model.objects.bulk_create(objects, batch_size=SQL_BATCH,
+                                          ignore_conflicts=True)
+            self.counts[kind] += len(objects)
+            self.skipped[kind] += len(records) - len(objects)
+            if self.progress:
+                self.progress(kind, self.counts[kind])
+        if self.checkpoint:
+            self.checkpoint(offset)
+
+    def _resolve(self, cache, model, field, keys):
+        missing = {key for key in keys if key and key not in cache}
+        for chunk in _chunks(missing):
+            cache.update(model.objects.filter(
+                **{f'{field}__in': chunk}).values_list(field, 'id'))
+        return cache
+
+    @staticmethod
+    def _date(value):
+        return parse_datetime(value) if value else timezone.now()
+
+    def build_users(self, records):
+        return [User(
+            username=record['username'],
+            email=record.get('email', ''),
+            first_name=record.get('first_name', ''),
+            last_name=record.get('last_name', ''),
+            password=record.get('password') or make_password(None),
+            is_active=record.get('is_active', True),
+            date_joined=self._date(record.get('date_joined')),
+        ) for record in records]
+
+    def build_groups(self, records):
+        return [Group(slug=record['slug'], title=record['title'],
+                      description=record.get('description', ''))
+                for record in records]
+
+    def build_posts(self, records):
+        users = self._resolve(self.user_ids, User, 'username',
+                              (record['author'] for record in records))
+        groups = self._resolve(self.group_ids, Group, 'slug',
+                               (record.get('group') for record in records))
+        posts = []
+        for record in records:
+            group = record.get('group')
+            if record['author'] not in users or (group and
+                                                 group not in groups):
+                continue
+            pub_date = self._date(record.get('pub_date'))
+            posts.append(Post(
+                id=record['id'], text=record['text'],
+                author_id=users[record['author']],
+                group_id=groups[group] if group else None,
+                image=record.get('image') or '',
+                pub_date=pub_date, edited=pub_date,
+            ))
+        return posts
+
+    def build_comments(self, records):
+        users = self._resolve(self.user_ids, User, 'username',
+                              (record['author'] for record in records))
+        post_ids = set()
+        for chunk in _chunks({record['post'] for record in records}):
+            post_ids.update(Post.objects.filter(
+                id__in=chunk).values_list('id', flat=True))
+        return [Comment(
+            id=record['id'], post_id=record['post'],
+            author_id=users[record['author']], text=record['text'],
+            created=self._date(record.get('created')),
+        ) for record in records
+            if record['author'] in users and record['post'] in post_ids]
+
+    def build_follows(self, records):
+        users = self._resolve(
+            self.user_ids, User, 'username',
+            [name for record in records
+             for name in (record['user'], record['author'])])
+        return [Follow(user_id=users[record['user']],
+                       author_id=users[record['author']])
+                for record in records
+                if record['user'] in users and record['author'] in users
+                and record['user'] != record['author']]
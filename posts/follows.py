@@ -0,0 +1,104 @@
+"""
+Подписка и отписка одним запросом на запись.
+
+follow() вставляет строки через INSERT ... ON CONFLICT DO NOTHING по
+уникальному индексу (user, author), unfollow() удаляет их одним DELETE;
+RETURNING сообщает, какие строки действительно изменились. Поэтому
+повторные и одновременные клики ничего не задваивают, а счётчики,
+ленты и кэш меняются только для изменившихся подписок — то же, что
+делают сигналы Follow, которые при таком пути не вызываются.
+
+Новые значения счётчиков приходят из тех же UPDATE ... RETURNING
+(posts.counters.shift).
+"""
+from django.db import connections, router, transaction
+
+from posts import caching, counters, recommendations, timeline
+from posts.models import Follow
+
+# авторов в одном пакетном запросе
+MAX_BATCH = 100
+
+
+class FollowResult:
+    def __init__(self, changed, following_count, followers_count):
+        # авторы, подписка на которых действительно изменилась
+        self.changed = changed
+        # подписок у читателя после изменения, None — если ничего
+        # не изменилось и счётчик не читался
+        self.following_count = following_count
+        # {id автора: подписчиков} для изменившихся авторов
+        self.followers_count = followers_count
+
+    def as_dict(self):
+        return {
+            'changed': [author.username for author in self.changed],
+            'following_count': self.following_count,
+            'followers_count': {
+                author.username: self.followers_count[author.pk]
+                for author in self.changed
+            },
+        }
+
+
+def _execute(sql, params):
+    connection = connections[router.db_for_write(Follow)]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=quote(Follow._meta.db_table)),
+                       params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _apply(user, changed, delta):
+    if not changed:
+        return FollowResult([], None, {})
+    following = counters.shift('following_count', [user.pk],
+                               delta * len(changed))
+    followers = counters.shift('followers_count',
+                               [author.pk for author in changed], delta)
+    for author in changed:
+        if delta > 0:
+            timeline.backfill(user.pk, author.pk)
+        else:
+            timeline.prune(user.pk, author.pk)
+        timeline.followers_changed(author.pk, followers[author.pk])
+    recommendations.follows_changed(
+        user.pk, [author.pk for author in changed], followed=delta > 0)
+    caching.bump(caching.author_ns(user.username), caching.follow_ns(user.pk),
+                 *(caching.author_ns(author.username) for author in changed))
+    return FollowResult(changed, following[user.pk], followers)
+
+
+def follow(user, authors):
+    """
+    Подписывает user на authors (на себя подписаться нельзя).
+    """
+    authors = {author.pk: author for author in authors
+               if author.pk != user.pk}
+    if not authors:
+        return FollowResult([], None, {})
+    values = ', '.join(['(%s, %s)'] * len(authors))
+    params = [value for author_id in authors for value in (user.pk, author_id)]
+    with transaction.atomic(using=router.db_for_write(Follow)):
+        inserted = _execute(
+            'INSERT INTO {table} (user_id, author_id) VALUES ' + values
+            + ' ON CONFLICT DO NOTHING RETURNING author_id', params)
+        return _apply(user, [authors[pk] for pk in authors
+                             if pk in inserted], 1)
+
+
+def unfollow(user, authors):
+    """
+    Отписывает user от authors.
+    """
+    authors = {author.pk: author for author in authors}
+    if not authors:
+        return FollowResult([], None, {})
+    placeholders = ', '.join(['%s'] * len(authors))
+    with transaction.atomic(using=router.db_for_write(Follow)):
+        deleted = _execute(
+            'DELETE FROM {table} WHERE user_id = %s AND author_id IN ('
+            + placeholders + ') RETURNING author_id', [user.pk, *authors])
+        return _apply(user, [authors[pk] for pk in authors
+                             if pk in deleted], -1)
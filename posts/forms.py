@@ -1,6 +1,7 @@
 from django import forms
 from django.forms import ModelForm
 
+from posts import uploads
 from posts.models import Post, Comment
 
 
@@ -9,6 +10,41 @@ class PostForm(ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    def clean_image(self):
+        # К этому моменту ImageField прочитал только заголовок картинки
+        # (Image.open и verify), пиксели ещё не декодированы.
+        image = self.cleaned_data.get('image')
+        if not getattr(image, 'image', None):
+            return image
+        if image.size > uploads.MAX_BYTES:
+            raise self._too_large()
+        width, height = image.image.size
+        if width * height > uploads.MAX_PIXELS:
+            raise forms.ValidationError(
+                'Картинка больше %(limit)s мегапикселей.',
+                code='too_many_pixels',
+                params={'limit': uploads.MAX_PIXELS // 1000000})
+        if max(width, height) > uploads.MAX_EDGE:
+            return uploads.shrink(image)
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        image = self.files.get(self.add_prefix('image'))
+        if getattr(image, 'rejected', None) == uploads.REJECTED_SIZE:
+            # от слишком большого файла BoundedUploadHandler сохранил
+            # только начало, и ImageField уже счёл его испорченной
+            # картинкой — показываем настоящую причину
+            self.errors.pop('image', None)
+            self.add_error('image', self._too_large())
+        return cleaned_data
+
+    @staticmethod
+    def _too_large():
+        return forms.ValidationError(
+            'Файл больше %(limit)s МБ.', code='too_large',
+            params={'limit': uploads.MAX_BYTES // (1024 * 1024)})
+
 
 class CommentForm(ModelForm):
     class Meta:
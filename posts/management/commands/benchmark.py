@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон главной, группы, профиля, поста, ленты '
+            'подписок и поиска: перцентили времени ответа, запросы к базе '
+            'и пропускная способность')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--wsgi', action='store_true',
+                            help='Ходить по HTTP к локальному WSGI-серверу, '
+                                 'а не через тестовый клиент')
+        parser.add_argument('--cold', action='store_true',
+                            help='Сбрасывать кэш перед каждым запросом')
+        parser.add_argument('--only', nargs='*',
+                            help='Прогнать только эти сценарии')
+        parser.add_argument('--concurrent', action='store_true',
+                            help='Смешанная нагрузка: чтение ленты в '
+                                 'потоках вместе с записью комментариев')
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Длительность смешанной нагрузки, секунд')
+        parser.add_argument('--output', '-o',
+                            help='Сохранить результаты в JSON')
+        parser.add_argument('--compare',
+                            help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['concurrent']:
+            results = benchmark.concurrent(options['readers'],
+                                           options['writers'],
+                                           options['duration'])
+        else:
+            results = self.pages(options)
+
+        for name, result in results['scenarios'].items():
+            if not result['requests']:
+                self.stdout.write(f'{name:>16}: ни одного успешного '
+                                  f'запроса, ошибок {result["errors"]}')
+                continue
+            self.stdout.write(
+                f'{name:>16}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'{result["queries_mean"]} запросов, '
+                f'{result["throughput_rps"]} запр/с'
+                + (f', ошибок {result["errors"]}' if 'errors' in result
+                   else ''))
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as stream:
+                baseline = json.load(stream)
+            self.stdout.write(self.style.MIGRATE_HEADING('Сравнение'))
+            for line in benchmark.compare(baseline, results):
+                self.stdout.write(f'  {line}')
+
+    @staticmethod
+    def pages(options):
+        runner = (benchmark.WSGIRunner() if options['wsgi']
+                  else benchmark.InProcessRunner())
+        try:
+            return benchmark.run(runner, options['requests'],
+                                 options['warmup'], options['cold'],
+                                 options['only'])
+        finally:
+            runner.close()
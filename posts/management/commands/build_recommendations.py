@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» по графу подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true',
+                            help='Только читателей, чьи подписки '
+                                 'изменились после прошлого расчёта')
+        parser.add_argument('--top-k', type=int,
+                            default=recommendations.TOP_K)
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            done = recommendations.build_stale(options['top_k'])
+        else:
+            done = recommendations.build(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации посчитаны для {done} пользователей'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import comment_queue
+
+
+class Command(BaseCommand):
+    help = ('Переносит комментарии из очереди приёма в базу '
+            '(COMMENT_INGESTION = "queue")')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а переносить очередь '
+                                 'каждые --interval секунд')
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument('--batch-size', type=int,
+                            default=comment_queue.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            stored = comment_queue.drain(options['batch_size'])
+            if stored or not options['loop']:
+                self.stdout.write(f'Перенесено комментариев: {stored}')
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
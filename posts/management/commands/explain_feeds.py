@@ -0,0 +1,120 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Follow, Group, Post, User
+from posts.pagination import FEED_ORDERING, CursorPaginator
+
+
+class Command(BaseCommand):
+    help = ('Показывает планы и время запросов лент с индексами и без них. '
+            'Индексы удаляются внутри транзакции, которая потом '
+            'откатывается, поэтому база не меняется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-posts', type=int, default=0,
+                            help='Сначала создать столько случайных постов')
+        parser.add_argument('--seed-users', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз выполнять каждый запрос')
+
+    def handle(self, *args, **options):
+        if options['seed_posts']:
+            self.seed(options['seed_users'], options['seed_posts'])
+        queries = self.feed_queries()
+        if not queries:
+            self.stderr.write('В базе нет постов и подписок, '
+                              'запустите с --seed-posts')
+            return
+
+        with transaction.atomic():
+            self.report('Без индексов', queries, options['repeat'],
+                        drop=True)
+            transaction.set_rollback(True)
+        self.report('С индексами', queries, options['repeat'])
+
+    def seed(self, users_count, posts_count):
+        offset = User.objects.count()
+        User.objects.bulk_create(
+            [User(username=f'seed_{offset + i}') for i in range(users_count)])
+        users = list(User.objects.values_list('id', flat=True))
+        group_offset = Group.objects.count()
+        Group.objects.bulk_create(
+            [Group(title=f'Группа {i}', slug=f'seed-{group_offset + i}',
+                   description='') for i in range(10)])
+        groups = list(Group.objects.values_list('id', flat=True)) + [None]
+        Post.objects.bulk_create(
+            (Post(text='Пост', author_id=random.choice(users),
+                  group_id=random.choice(groups))
+             for _ in range(posts_count)),
+            batch_size=500,
+        )
+        Follow.objects.bulk_create(
+            [Follow(user_id=random.choice(users),
+                    author_id=random.choice(users))
+             for _ in range(users_count * 10)],
+            batch_size=500, ignore_conflicts=True,
+        )
+
+    def feed_queries(self):
+        post = Post.objects.order_by('?').first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            return []
+        feed = Post.objects.for_feed().order_by(*FEED_ORDERING)
+        cursor = CursorPaginator(feed, 10)._seek(
+            [post.pub_date, post.id], forward=True)
+        return [
+            ('Главная, страница 1', feed[:10]),
+            ('Главная, OFFSET 5000', feed[5000:5010]),
+            ('Главная, курсор', feed.filter(cursor)[:10]),
+            ('Группа', feed.filter(group_id=post.group_id)[:10]),
+            ('Профиль', feed.filter(author_id=post.author_id)[:10]),
+            ('Проверка подписки', Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id)[:1]),
+        ]
+
+    def drop_indexes(self):
+        # schema_editor в SQLite нельзя открыть внутри транзакции,
+        # а обычный DROP INDEX откатывается вместе с ней
+        with connection.cursor() as cursor:
+            for index in Post._meta.indexes:
+                cursor.execute(
+                    f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def unindexed_sql(self, queryset, sql):
+        """
+        Уникальный индекс Follow в SQLite — часть таблицы, его не удалить
+        временно. Унарный плюс перед author_id запрещает SQLite
+        использовать индекс для этого условия, и план становится таким,
+        каким он был без составного индекса.
+        """
+        if queryset.model is not Follow or connection.vendor != 'sqlite':
+            return sql
+        column = '"posts_follow"."author_id"'
+        return sql.replace(f'{column} =', f'+{column} =')
+
+    def report(self, title, queries, repeat, drop=False):
+        if drop:
+            self.drop_indexes()
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        explain = ('EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite'
+                   else 'EXPLAIN')
+        with connection.cursor() as cursor:
+            for name, queryset in queries:
+                sql, params = queryset.query.sql_with_params()
+                if drop:
+                    sql = self.unindexed_sql(queryset, sql)
+                cursor.execute(f'{explain} {sql}', params)
+                plan = [' '.join(str(col) for col in row)
+                        for row in cursor.fetchall()]
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                elapsed = (time.perf_counter() - started) / repeat * 1000
+                self.stdout.write(f'  {name}: {elapsed:.2f} мс')
+                for line in plan:
+                    self.stdout.write(f'      {line}')
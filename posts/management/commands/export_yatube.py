@@ -0,0 +1,35 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import dumps
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и '
+            'подписки в NDJSON (одна запись JSON на строку)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-',
+                            help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(kind, count):
+            rate = count / max(time.monotonic() - started, 1e-6)
+            self.stderr.write(f'{kind}: {count} ({rate:.0f} записей/с)')
+
+        if options['output'] == '-':
+            counts = dumps.export(sys.stdout.buffer, options['batch_size'],
+                                  progress)
+        else:
+            with open(options['output'], 'wb') as stream:
+                counts = dumps.export(stream, options['batch_size'],
+                                      progress)
+        elapsed = time.monotonic() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено записей: {sum(counts.values())} '
+            f'за {elapsed:.1f} с'))
@@ -0,0 +1,197 @@
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import dumps
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'кот собака утро вечер город дорога лес река море солнце дождь снег '
+    'книга музыка фильм работа отпуск друзья семья праздник кофе чай '
+    'новости погода спорт футбол программирование джанго питон база '
+    'данных запрос сервер страница лента подписка комментарий фотография '
+    'путешествие поезд самолёт горы озеро весна лето осень зима'
+).split()
+
+
+def zipf_weights(count, skew):
+    """
+    Накопленные веса закона Ципфа: элемент с рангом r выбирается
+    с вероятностью, пропорциональной 1 / r ** skew.
+    """
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def pick(items, cum_weights, k=1):
+    return random.choices(items, cum_weights=cum_weights, k=k)
+
+
+def heavy_tail(mean, alpha=1.5):
+    # у распределения Парето с alpha=1.5 среднее равно 3
+    return int(random.paretovariate(alpha) * mean / 3)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу правдоподобными данными: популярность авторов, '
+            'размеры групп и число комментариев распределены по '
+            'степенному закону')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--follows-per-user', type=float, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--comments-per-post', type=float, default=2,
+                            help='Среднее число комментариев к посту')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель закона Ципфа: чем больше, тем '
+                                 'сильнее перекос в пользу популярных')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--no-finalize', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и '
+                                 'поисковый индекс')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        started = time.monotonic()
+
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        self.create_follows(users, options['follows_per_user'])
+        posts = self.create_posts(users, groups, options['posts'],
+                                  options['days'])
+        self.create_comments(users, posts, options['comments_per_post'])
+
+        if not options['no_finalize']:
+            self.stderr.write(
+                'Пересчитываем счётчики, ленты и поисковый индекс')
+            dumps.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.monotonic() - started:.1f} с'))
+
+    def report(self, name, count, started):
+        rate = count / max(time.monotonic() - started, 1e-6)
+        self.stderr.write(f'{name}: {count} ({rate:.0f} записей/с)')
+
+    def write(self, model, objects, name):
+        """
+        Пишет объекты порциями по batch_size, каждую в своей транзакции.
+        """
+        started = time.monotonic()
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += self._flush(model, batch)
+                batch = []
+                self.report(name, total, started)
+        total += self._flush(model, batch)
+        self.report(name, total, started)
+
+    @staticmethod
+    def _flush(model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=dumps.SQL_BATCH,
+                                      ignore_conflicts=True)
+        return len(batch)
+
+    def create_users(self, count):
+        offset = User.objects.count()
+        # вход под сгенерированными пользователями не нужен
+        password = make_password(None)
+        self.write(User, (User(username=f'user{offset + i}',
+                               password=password) for i in range(count)),
+                   'Пользователи')
+        users = list(User.objects.order_by('id').values_list('id', flat=True))
+        # ранг популярности не должен совпадать с порядком создания
+        random.shuffle(users)
+        return users
+
+    def create_groups(self, count):
+        offset = Group.objects.count()
+        self.write(Group, (Group(title=f'Группа {offset + i}',
+                                 slug=f'group-{offset + i}',
+                                 description='Сгенерированная группа')
+                           for i in range(count)), 'Группы')
+        groups = list(Group.objects.values_list('id', flat=True))
+        random.shuffle(groups)
+        return groups
+
+    def create_follows(self, users, mean):
+        weights = zipf_weights(len(users), self.skew)
+
+        def follows():
+            for user_id in users:
+                wanted = min(heavy_tail(mean), len(users) - 1)
+                for author_id in set(pick(users, weights, wanted)):
+                    if author_id != user_id:
+                        yield Follow(user_id=user_id, author_id=author_id)
+
+        self.write(Follow, follows(), 'Подписки')
+
+    def create_posts(self, users, groups, count, days):
+        """
+        Возвращает id созданных постов, их возраст в секундах и момент
+        отсчёта — по ним раскладываются даты комментариев.
+        """
+        # популярные авторы пишут чаще, а размеры групп тоже неравны
+        author_weights = zipf_weights(len(users), self.skew)
+        group_weights = zipf_weights(len(groups), self.skew)
+        now = timezone.now()
+        span = timedelta(days=days).total_seconds()
+        # даты упорядочены, чтобы id росли вместе с pub_date
+        offsets = sorted((random.random() * span for _ in range(count)),
+                         reverse=True)
+        first_id = (Post.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0) + 1
+
+        def posts():
+            for i, offset in enumerate(offsets):
+                pub_date = now - timedelta(seconds=offset)
+                group_id = None
+                if groups and random.random() < 0.6:
+                    group_id = pick(groups, group_weights)[0]
+                yield Post(
+                    id=first_id + i,
+                    text=' '.join(random.choices(WORDS,
+                                                 k=random.randint(5, 60))),
+                    author_id=pick(users, author_weights)[0],
+                    group_id=group_id,
+                    pub_date=pub_date, edited=pub_date,
+                )
+
+        with dumps.original_timestamps():
+            self.write(Post, posts(), 'Посты')
+        return range(first_id, first_id + count), offsets, now
+
+    def create_comments(self, users, posts, mean):
+        post_ids, offsets, now = posts
+
+        def comments():
+            for post_id, offset in zip(post_ids, offsets):
+                for _ in range(heavy_tail(mean)):
+                    created = now - timedelta(
+                        seconds=random.random() * offset)
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=random.choice(users),
+                        text=' '.join(random.choices(WORDS, k=8)),
+                        created=created,
+                    )
+
+        with dumps.original_timestamps():
+            self.write(Comment, comments(), 'Комментарии')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры и копии картинок для постов, '
+            'у которых их ещё нет')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перестроить миниатюры всех постов')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            posts = posts.filter(Q(thumbnail='') | Q(rendition__isnull=True))
+        done = failed = 0
+        for post_id in posts.values_list('id', flat=True).iterator():
+            if thumbnails.generate(post_id):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюр построено: {done}, не удалось: {failed}'))
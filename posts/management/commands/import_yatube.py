@@ -0,0 +1,82 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts import dumps
+
+
+class Command(BaseCommand):
+    help = ('Загружает NDJSON, выгруженный export_yatube. После сбоя '
+            'запустите ещё раз с --resume, чтобы продолжить с места '
+            'последней записанной порции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить с сохранённой позиции')
+        parser.add_argument('--checkpoint',
+                            help='Файл с позицией, по умолчанию '
+                                 '<path>.checkpoint')
+        parser.add_argument('--no-finalize', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и '
+                                 'поисковый индекс после загрузки')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        offset = 0
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as stream:
+                offset = json.load(stream)['offset']
+            self.stderr.write(f'Продолжаем с байта {offset}')
+
+        def checkpoint(position):
+            # пишем во временный файл и переименовываем, чтобы
+            # сбой посреди записи не испортил сохранённую позицию
+            with open(f'{checkpoint_path}.tmp', 'w') as stream:
+                json.dump({'offset': position}, stream)
+            os.replace(f'{checkpoint_path}.tmp', checkpoint_path)
+
+        started = time.monotonic()
+        last_report = [started]
+
+        def progress(kind, count):
+            now = time.monotonic()
+            if now - last_report[0] < 1:
+                return
+            last_report[0] = now
+            total = sum(importer.counts.values())
+            self.stderr.write(f'{kind}: {count}, всего {total} '
+                              f'({total / (now - started):.0f} записей/с)')
+
+        importer = dumps.Importer(options['batch_size'], progress, checkpoint)
+        try:
+            with open(path, 'rb') as stream:
+                importer.run(stream, offset)
+        except (OSError, ValueError, DatabaseError) as error:
+            raise CommandError(
+                f'{error}. Позиция сохранена в {checkpoint_path}, '
+                f'продолжите с --resume')
+        os.remove(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        total = sum(importer.counts.values())
+        summary = ', '.join(f'{kind}: {importer.counts[kind]}'
+                            for kind in dumps.RECORD_TYPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} записей/с). {summary}'))
+        skipped = sum(importer.skipped.values())
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Пропущено записей без пользователя, группы или поста: '
+                f'{skipped}'))
+
+        if not options['no_finalize']:
+            self.stderr.write(
+                'Пересчитываем счётчики, ленты и поисковый индекс')
+            dumps.rebuild_derived()
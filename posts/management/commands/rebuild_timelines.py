@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (TimelineEntry) с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей',
+        )
+        parser.add_argument(
+            '--demoted', action='store_true',
+            help='Только разложить по лентам посты авторов, '
+                 'переставших быть знаменитостями',
+        )
+
+    def handle(self, *args, **options):
+        if options['demoted']:
+            demoted = timeline.demote()
+            self.stdout.write(self.style.SUCCESS(
+                f'Посты разложены по лентам, авторов: {demoted}'))
+            return
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        processed = timeline.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, обработано подписок: {processed}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки популярного с текущим числом '
+            'подписчиков авторов (запускать по расписанию)')
+
+    def handle(self, *args, **options):
+        changed = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки популярного пересчитаны, изменилось постов: {changed}'))
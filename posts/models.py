@@ -8,19 +8,79 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    # счётчик поддерживается сигналами, см. posts.counters
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+class ImageRendition(models.Model):
+    """
+    Набор уменьшенных копий картинки в современных форматах. Адресуется
+    хэшем содержимого, поэтому одинаковые загрузки обрабатываются один
+    раз и делят файлы. Сами файлы строит posts.renditions.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    widths = models.CharField(max_length=100)  # "480,960,1440"
+    formats = models.CharField(max_length=100)  # "avif,webp,jpeg"
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest[:12]
+
+    def sources(self):
+        from posts.renditions import sources
+        return sources(self)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Всё, что нужно карточке поста, одним запросом: автор, группа
+        и набор копий картинки.
+        Число комментариев хранится в самом посте (comments_count).
+        """
+        return self.select_related('author', 'group', 'rendition')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    # время последнего изменения, входит в ключ кэша карточки поста
+    edited = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="posts")
     group = models.ForeignKey(Group, on_delete=models.CASCADE, blank=True,
                               null=True, related_name='posts')
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # адрес готовой миниатюры, заполняется фоном (см. posts.thumbnails)
+    thumbnail = models.CharField(max_length=255, blank=True, editable=False)
+    rendition = models.ForeignKey(ImageRendition, on_delete=models.SET_NULL,
+                                  blank=True, null=True, editable=False,
+                                  related_name='posts')
+    # счётчик поддерживается сигналами, см. posts.counters
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # оценка популярности в логарифмах, см. posts.trending
+    trending = models.FloatField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        # индексы под сортировку лент: общей, группы и автора
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            # популярное: общее и по группе
+            models.Index(fields=['-trending', '-id'],
+                         name='post_trending_idx'),
+            models.Index(fields=['group', '-trending', '-id'],
+                         name='post_group_trending_idx'),
+        ]
 
     def __str__(self):
         return self.text[:10]
@@ -33,6 +93,16 @@ class Comment(models.Model):
                                related_name='comments')
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    # строка очереди, из которой пришёл комментарий, см. posts.comment_queue
+    queue_token = models.CharField(max_length=32, unique=True, null=True,
+                                   blank=True, editable=False)
+
+    class Meta:
+        # комментарии поста выбираются страницами по (created, id)
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -41,5 +111,71 @@ class Follow(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')  # автор
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
     def __str__(self):
         return f'Автор: {self.author}, подписчик: {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Готовая лента подписок: строка на каждую пару «читатель — пост».
+    Заполняется при публикации поста (fan-out on write), см. posts.timeline.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')  # читатель
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # копия post.pub_date, чтобы лента сортировалась по индексу
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+        ]
+
+
+class UserStats(models.Model):
+    """
+    Счётчики пользователя, чтобы не считать COUNT(*) на каждой странице.
+    Поддерживаются сигналами, см. posts.counters.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    followers_count = models.PositiveIntegerField(default=0)  # подписчики
+    following_count = models.PositiveIntegerField(default=0)  # подписки
+    posts_count = models.PositiveIntegerField(default=0)
+    # посты автора не разносятся по лентам, см. posts.timeline
+    celebrity = models.BooleanField(default=False)
+
+
+class Suggestion(models.Model):
+    """
+    Готовые рекомендации «кого почитать»: top-K авторов на читателя,
+    строятся пакетно по графу подписок, см. posts.recommendations.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='suggestions')  # читатель
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('user', 'author')
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+
+class StaleSuggestions(models.Model):
+    """
+    Читатели, чьи подписки изменились после последнего расчёта
+    рекомендаций; их пересчитывает build_recommendations --stale.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='+')
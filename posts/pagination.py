@@ -0,0 +1,220 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# Ленты по умолчанию упорядочены от новых записей к старым.
+FEED_ORDERING = ('-pub_date', '-id')
+# сколько номеров страниц показывать вокруг текущей и по краям
+ON_EACH_SIDE = 3
+ON_ENDS = 2
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values):
+    """
+    Упаковывает значения полей сортировки в непрозрачный токен для URL.
+    """
+    raw = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(token + padding)
+        values = json.loads(raw.decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values
+
+
+class CursorPage:
+    """
+    Страница курсорной пагинации. Повторяет ту часть интерфейса
+    django.core.paginator.Page, которой пользуются шаблоны.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (keyset): вместо OFFSET страница ищется условием
+    на поля сортировки, поэтому глубокие страницы стоят столько же,
+    сколько первая, и не нужен COUNT(*).
+
+    Последним полем сортировки должен идти уникальный ключ (обычно id),
+    иначе записи с одинаковыми значениями могут теряться на границе.
+    Сортировать можно и по аннотациям запроса.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self._fields = [name.lstrip('-') for name in self.ordering]
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, name) for name in self._fields])
+
+    def _field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _decode(self, token):
+        values = decode_cursor(token)
+        if len(values) != len(self._fields):
+            raise InvalidCursor(token)
+        try:
+            return [self._field(name).to_python(value)
+                    for name, value in zip(self._fields, values)]
+        except Exception:
+            raise InvalidCursor(token)
+
+    def _seek(self, values, forward):
+        """
+        Строит условие «строго после курсора» для лексикографического
+        порядка: (a < x) OR (a = x AND b < y) OR ...
+        Отдельная граница a <= x позволяет базе начать просмотр индекса
+        сразу с курсора, а не с начала.
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') == forward else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering]
+
+    def get_page(self, after=None, before=None):
+        """
+        Возвращает страницу после курсора after или перед курсором before.
+        Испорченный токен не считается ошибкой — отдаётся первая страница.
+        """
+        queryset = self.object_list
+        try:
+            if before:
+                values = self._decode(before)
+                rows = list(
+                    queryset.filter(self._seek(values, forward=False))
+                    .order_by(*self._reversed_ordering())[:self.per_page + 1]
+                )
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                return CursorPage(rows, self, True, has_previous)
+            if after:
+                values = self._decode(after)
+                queryset = queryset.filter(self._seek(values, forward=True))
+        except InvalidCursor:
+            after = None
+            queryset = self.object_list
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next, bool(after))
+
+
+def elided_page_range(paginator, number, on_each_side=ON_EACH_SIDE,
+                      on_ends=ON_ENDS):
+    """
+    Номера страниц для навигации: по on_ends с краёв и по on_each_side
+    вокруг текущей, пропуски — None. Как get_elided_page_range из
+    Django 3.2: число ссылок не растёт с числом страниц.
+    """
+    num_pages = paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(paginator.page_range)
+    if number > 1 + on_each_side + on_ends + 1:
+        pages = [*range(1, on_ends + 1), None,
+                 *range(number - on_each_side, number + 1)]
+    else:
+        pages = list(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages += [*range(number + 1, number + on_each_side + 1), None,
+                  *range(num_pages - on_ends + 1, num_pages + 1)]
+    else:
+        pages += list(range(number + 1, num_pages + 1))
+    return pages
+
+
+def paginate(request, queryset, per_page=10, count=None,
+             ordering=FEED_ORDERING):
+    """
+    Разбивает ленту на страницы. Обычная постраничная навигация (?page=)
+    сохраняется, а если в запросе есть ?after= или ?before=, страница
+    выбирается по курсору. count — заранее известное число записей,
+    чтобы не считать его отдельным запросом; ordering — порядок, в
+    котором queryset уже упорядочен.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        paginator = CursorPaginator(queryset, per_page, ordering)
+        return paginator.get_page(after=after, before=before), paginator
+
+    paginator = Paginator(queryset, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(request.GET.get('page'))
+    page.page_links = elided_page_range(paginator, page.number)
+    # Переход на следующую страницу идёт уже по курсору,
+    # чтобы глубокие страницы не превращались в OFFSET.
+    page.next_cursor = None
+    if page.has_next() and len(page):
+        page.next_cursor = CursorPaginator(
+            queryset, per_page, ordering).cursor_for(page[len(page) - 1])
+    return page, paginator
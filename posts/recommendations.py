@@ -0,0 +1,232 @@
+"""
+Рекомендации «кого почитать».
+
+Граф подписок загружается в память не объектами моделей, а в формате
+CSR (posts.recommendations.FollowGraph): плотные номера пользователей и
+два массива array('l'). Кандидаты для читателя — авторы, на которых
+подписаны его собственные подписки (две ступени по графу), и самые
+читаемые авторы его групп. Оценка кандидата:
+
+    co-follow + GROUP_WEIGHT * доля групп кандидата среди групп читателя
+
+где co-follow — сколько подписок читателя подписаны на кандидата, а
+группы читателя — группы постов его подписок и его собственных постов.
+
+top-K на читателя сохраняется в Suggestion, и страница получает их
+одним запросом по индексу. При изменении подписок рекомендации этого
+читателя сразу теряют нового автора, а сам читатель помечается
+устаревшим (StaleSuggestions) и пересчитывается пакетом
+build_recommendations --stale; полный пересчёт — без --stale.
+"""
+import heapq
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from posts import caching
+from posts.models import (Follow, Post, StaleSuggestions, Suggestion, User,
+                          UserStats)
+
+TOP_K = getattr(settings, 'RECOMMENDATIONS_TOP_K', 20)
+GROUP_WEIGHT = 0.5
+# самых читаемых авторов группы, которые попадают в кандидаты
+GROUP_CANDIDATES = 20
+SQL_BATCH = 500
+
+
+def _chunks(items, size=SQL_BATCH):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FollowGraph:
+    """
+    Подписки в формате CSR: подписки пользователя с номером i —
+    indices[indptr[i]:indptr[i + 1]], номера переводятся в id через ids.
+    Восемь байт на ребро вместо объекта модели на каждую подписку.
+    """
+
+    def __init__(self, pairs):
+        """
+        pairs — пары (user_id, author_id), упорядоченные по user_id.
+        """
+        sources, targets = array('l'), array('l')
+        for user_id, author_id in pairs:
+            sources.append(user_id)
+            targets.append(author_id)
+        self.ids = array('l')
+        self.number = {}
+        # сначала номера получают подписчики — по порядку строк CSR,
+        # затем авторы, у которых своих подписок нет
+        for user_id in sources:
+            self._node(user_id)
+        self.rows = len(self.ids)
+        self.indptr = array('l', [0] * (self.rows + 1))
+        for user_id in sources:
+            self.indptr[self.number[user_id] + 1] += 1
+        for row in range(self.rows):
+            self.indptr[row + 1] += self.indptr[row]
+        self.indices = array('l', (self._node(author_id)
+                                   for author_id in targets))
+
+    def _node(self, user_id):
+        node = self.number.get(user_id)
+        if node is None:
+            node = self.number[user_id] = len(self.ids)
+            self.ids.append(user_id)
+        return node
+
+    def following(self, node):
+        if node >= self.rows:
+            return ()
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    @classmethod
+    def load(cls, users=None):
+        """
+        Весь граф или, для users, только их подписки и подписки их
+        подписок — ровно то, что нужно для расчёта их рекомендаций.
+        """
+        follows = Follow.objects.order_by('user_id', 'author_id')
+        if users is None:
+            return cls(follows.values_list('user_id', 'author_id')
+                       .iterator(chunk_size=10000))
+        rows = set()
+        for chunk in _chunks(users):
+            rows.update(follows.filter(user_id__in=chunk)
+                        .values_list('user_id', 'author_id'))
+        second = {author_id for _, author_id in rows} - set(users)
+        for chunk in _chunks(second):
+            rows.update(follows.filter(user_id__in=chunk)
+                        .values_list('user_id', 'author_id'))
+        return cls(sorted(rows))
+
+
+class Scorer:
+    """
+    Считает top-K для читателей по графу и группам постов.
+    """
+
+    def __init__(self, graph, top_k=TOP_K):
+        self.graph = graph
+        self.top_k = top_k
+        self.author_groups = defaultdict(set)
+        for author_id, group_id in Post.objects.filter(
+                group__isnull=False).order_by().values_list(
+                'author_id', 'group_id').distinct().iterator():
+            self.author_groups[author_id].add(group_id)
+        self.popularity = dict(UserStats.objects.values_list(
+            'user_id', 'followers_count').iterator())
+        members = defaultdict(list)
+        for author_id, groups in self.author_groups.items():
+            for group_id in groups:
+                members[group_id].append(author_id)
+        self.group_top = {
+            group_id: heapq.nlargest(
+                GROUP_CANDIDATES, authors,
+                key=lambda author_id: self.popularity.get(author_id, 0))
+            for group_id, authors in members.items()
+        }
+
+    def top(self, user_id):
+        """
+        Список (author_id, score) лучших кандидатов для читателя.
+        """
+        graph = self.graph
+        node = graph.number.get(user_id)
+        followed = set()
+        cofollow = defaultdict(int)
+        if node is not None:
+            followed = {graph.ids[i] for i in graph.following(node)}
+            for middle in graph.following(node):
+                for candidate in graph.following(middle):
+                    cofollow[graph.ids[candidate]] += 1
+        interests = set(self.author_groups.get(user_id, ()))
+        for author_id in followed:
+            interests |= self.author_groups.get(author_id, set())
+
+        candidates = set(cofollow)
+        for group_id in interests:
+            candidates.update(self.group_top.get(group_id, ()))
+        candidates -= followed | {user_id}
+
+        scored = []
+        for author_id in candidates:
+            groups = self.author_groups.get(author_id)
+            overlap = len(groups & interests) / len(groups) if groups else 0
+            score = cofollow.get(author_id, 0) + GROUP_WEIGHT * overlap
+            if score > 0:
+                scored.append((score, self.popularity.get(author_id, 0),
+                               author_id))
+        return [(author_id, score) for score, _, author_id
+                in heapq.nlargest(self.top_k, scored)]
+
+
+def build(users=None, top_k=TOP_K):
+    """
+    Пересчитывает рекомендации для users (всех, если None) и
+    возвращает число читателей, для которых они посчитаны.
+    """
+    graph = FollowGraph.load(users)
+    scorer = Scorer(graph, top_k)
+    if users is None:
+        users = User.objects.order_by('id').values_list(
+            'id', flat=True).iterator()
+    done = 0
+    for chunk in _chunks(users):
+        rows = [Suggestion(user_id=user_id, author_id=author_id, score=score)
+                for user_id in chunk
+                for author_id, score in scorer.top(user_id)]
+        with transaction.atomic():
+            Suggestion.objects.filter(user_id__in=chunk).delete()
+            Suggestion.objects.bulk_create(rows, batch_size=SQL_BATCH)
+        caching.bump(*(caching.suggestions_ns(user_id)
+                       for user_id in chunk))
+        done += len(chunk)
+    return done
+
+
+def build_stale(top_k=TOP_K):
+    """
+    Пересчитывает только читателей из StaleSuggestions. Если расчёт
+    упал, отметки возвращаются.
+    """
+    users = list(StaleSuggestions.objects.values_list('user_id', flat=True))
+    if not users:
+        return 0
+    StaleSuggestions.objects.filter(user_id__in=users).delete()
+    try:
+        return build(users, top_k)
+    except Exception:
+        StaleSuggestions.objects.bulk_create(
+            [StaleSuggestions(user_id=user_id) for user_id in users],
+            ignore_conflicts=True)
+        raise
+
+
+def follows_changed(user_id, author_ids, followed):
+    """
+    Вызывается при подписке и отписке: новых авторов сразу убираем из
+    рекомендаций, а читателя помечаем для пересчёта.
+    """
+    if followed:
+        Suggestion.objects.filter(user_id=user_id,
+                                  author_id__in=author_ids).delete()
+    StaleSuggestions.objects.bulk_create(
+        [StaleSuggestions(user_id=user_id)], ignore_conflicts=True)
+    caching.bump(caching.suggestions_ns(user_id))
+
+
+def for_user(user, limit=5):
+    """
+    Авторы, которых стоит предложить пользователю: один запрос по
+    индексу (user, -score).
+    """
+    if not user.is_authenticated:
+        return []
+    return [suggestion.author for suggestion in
+            Suggestion.objects.filter(user=user).select_related('author')
+            .order_by('-score')[:limit]]
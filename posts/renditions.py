@@ -0,0 +1,122 @@
+"""
+Копии картинок поста разной ширины в WebP, AVIF (если Pillow умеет его
+сохранять) и JPEG для <picture>/srcset.
+
+Файлы лежат по адресу renditions/<хэш>/<ширина>.<формат>, где хэш —
+SHA-256 содержимого исходника, поэтому повторная загрузка той же
+картинки не обрабатывается заново.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from posts.models import ImageRendition
+
+WIDTHS = getattr(settings, 'IMAGE_RENDITION_WIDTHS', (480, 960, 1440))
+# пропорции карточки поста, как у миниатюры 960x339
+ASPECT = 339 / 960
+ROOT = 'renditions'
+
+# формат: (имя в Pillow, MIME-тип, параметры сохранения)
+FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 50}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'progressive': True,
+                                    'optimize': True}),
+}
+
+
+def available_formats():
+    Image.init()
+    return [name for name, (pil_name, _, _) in FORMATS.items()
+            if pil_name in Image.SAVE]
+
+
+def content_hash(field_file):
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def file_name(digest, width, fmt):
+    return f'{ROOT}/{digest[:2]}/{digest}/{width}.{fmt}'
+
+
+def url(rendition, width, fmt):
+    return default_storage.url(file_name(rendition.digest, width, fmt))
+
+
+def sources(rendition):
+    """
+    Данные для <source> и <img> в шаблоне: MIME-тип и srcset на формат.
+    """
+    widths = [int(width) for width in rendition.widths.split(',')]
+    result = []
+    for fmt in rendition.formats.split(','):
+        srcset = ', '.join(f'{url(rendition, width, fmt)} {width}w'
+                           for width in widths)
+        result.append({'format': fmt, 'type': FORMATS[fmt][1],
+                       'srcset': srcset})
+    return result
+
+
+def _render(source, width, fmt):
+    size = (width, round(width * ASPECT))
+    image = ImageOps.fit(source, size, Image.LANCZOS)
+    pil_name, _, options = FORMATS[fmt]
+    buffer = BytesIO()
+    image.save(buffer, format=pil_name, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _store(name, content):
+    """
+    Сохраняет копию под именем name. Если её одновременно записал другой
+    поток, хранилище выберет свободное имя, и такой файл удаляется:
+    содержимое по тому же хэшу то же самое.
+    """
+    saved = default_storage.save(name, content)
+    if saved != name:
+        default_storage.delete(saved)
+
+
+def build(field_file):
+    """
+    Возвращает ImageRendition для картинки, при необходимости создавая
+    файлы. Картинка декодируется один раз на все ширины и форматы.
+    """
+    digest = content_hash(field_file)
+    existing = ImageRendition.objects.filter(digest=digest).first()
+    if existing is not None:
+        return existing
+
+    field_file.open('rb')
+    try:
+        source = Image.open(field_file)
+        source = ImageOps.exif_transpose(source).convert('RGB')
+    finally:
+        field_file.close()
+    # не растягиваем картинку сверх исходной ширины,
+    # но самая маленькая копия есть всегда
+    widths = [w for w in WIDTHS if w <= source.width] or [min(WIDTHS)]
+    formats = available_formats()
+    for width in widths:
+        for fmt in formats:
+            name = file_name(digest, width, fmt)
+            if not default_storage.exists(name):
+                _store(name, _render(source, width, fmt))
+    rendition, _ = ImageRendition.objects.get_or_create(
+        digest=digest,
+        defaults={'widths': ','.join(map(str, widths)),
+                  'formats': ','.join(formats)},
+    )
+    return rendition
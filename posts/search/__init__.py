@@ -0,0 +1,125 @@
+"""
+Полнотекстовый поиск по постам.
+
+Текст поста разбивается на слова, каждое слово приводится к основе
+русским стеммером, и основы попадают в индекс. Запрос обрабатывается
+так же, поэтому «котами» находит пост про «кота». Индекс обновляется
+сигналами сохранения и удаления поста, а сам движок задаётся
+настройкой SEARCH_BACKEND.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+from posts.pagination import CursorPage, InvalidCursor, decode_cursor, \
+    encode_cursor
+from posts.search.stemmer import stem
+
+# больше слов в запросе не нужно, а каждое усложняет поиск
+MAX_TERMS = 10
+WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        path = ('posts.search.backends.FTS5Backend'
+                if connection.vendor == 'sqlite'
+                else 'posts.search.backends.SimpleBackend')
+    return import_string(path)()
+
+
+def terms(text):
+    """
+    Основы слов текста в порядке появления.
+    """
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
+
+
+def query_terms(query):
+    # повторы в запросе не меняют результат, порядок сохраняем
+    return list(dict.fromkeys(terms(query)))[:MAX_TERMS]
+
+
+def index_post(post):
+    get_backend().index(post.pk, terms(post.text))
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def rebuild():
+    posts = Post.objects.order_by('id').values_list('id', 'text')
+    get_backend().rebuild(
+        (post_id, terms(text)) for post_id, text in posts.iterator())
+
+
+def matching_ids(query):
+    words = query_terms(query)
+    return get_backend().matching_ids(words) if words else []
+
+
+class SearchPaginator:
+    """
+    Курсорная пагинация результатов поиска. Курсор — пара (score, id)
+    последнего поста на странице, так что следующая страница не
+    пересчитывает предыдущие, как и в лентах.
+    """
+
+    def __init__(self, query, per_page, queryset=None):
+        self.query = query
+        self.terms = query_terms(query)
+        self.per_page = int(per_page)
+        if queryset is None:
+            queryset = Post.objects.for_feed()
+        self.object_list = queryset
+
+    def cursor_for(self, post):
+        return encode_cursor([post.search_score, post.id])
+
+    def _decode(self, token):
+        values = decode_cursor(token)
+        if len(values) != 2:
+            raise InvalidCursor(token)
+        try:
+            return float(values[0]), int(values[1])
+        except (TypeError, ValueError):
+            raise InvalidCursor(token)
+
+    def _load(self, rows):
+        posts = self.object_list.in_bulk([post_id for post_id, _ in rows])
+        result = []
+        for post_id, score in rows:
+            # пост могли удалить между поиском и выборкой
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_score = score
+                result.append(post)
+        return result
+
+    def get_page(self, after=None, before=None):
+        if not self.terms:
+            return CursorPage([], self, False, False)
+        backend = get_backend()
+        limit = self.per_page + 1
+        try:
+            if before:
+                rows = backend.search(self.terms, limit,
+                                      cursor=self._decode(before),
+                                      reverse=True)
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                return CursorPage(self._load(rows), self, True, has_previous)
+            cursor = self._decode(after) if after else None
+        except InvalidCursor:
+            after, cursor = None, None
+        rows = backend.search(self.terms, limit, cursor=cursor)
+        has_next = len(rows) > self.per_page
+        return CursorPage(self._load(rows[:self.per_page]), self, has_next,
+                          bool(after))
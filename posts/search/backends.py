@@ -0,0 +1,184 @@
+import re
+
+from django.db import connection, transaction
+from django.db.utils import OperationalError
+
+from posts.models import Post
+
+
+class BaseSearchBackend:
+    """
+    Интерфейс поискового индекса постов.
+
+    search() получает уже выделенные основы слов и возвращает пары
+    (id поста, score), упорядоченные по возрастанию score, а при равном
+    score — от новых постов к старым. cursor — пара (score, id), после
+    которой продолжить; reverse=True идёт в обратную сторону, для
+    ссылки «назад».
+    """
+
+    def index(self, post_id, terms):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, terms, limit, cursor=None, reverse=False):
+        raise NotImplementedError
+
+    def matching_ids(self, terms):
+        raise NotImplementedError
+
+    def setup(self):
+        """
+        Создаёт служебные таблицы индекса, если они нужны.
+        """
+
+    def rebuild(self, documents, batch_size=500):
+        """
+        Заново заполняет индекс из пар (id поста, основы слов).
+        """
+        self.clear()
+        for post_id, terms in documents:
+            self.index(post_id, terms)
+
+
+class SimpleBackend(BaseSearchBackend):
+    """
+    Запасной вариант без отдельного индекса: ищет основы слов прямо в
+    тексте постов. Работает на любой базе, но просматривает всю таблицу,
+    поэтому годится только для небольших сайтов и разработки.
+    """
+
+    def index(self, post_id, terms):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self, documents, batch_size=500):
+        pass
+
+    def _filter(self, terms):
+        queryset = Post.objects.all()
+        for term in terms:
+            # iregex, а не icontains: LIKE в SQLite не сравнивает
+            # кириллицу без учёта регистра
+            queryset = queryset.filter(text__iregex=re.escape(term))
+        return queryset
+
+    def search(self, terms, limit, cursor=None, reverse=False):
+        queryset = self._filter(terms)
+        if cursor is not None:
+            lookup = 'id__gt' if reverse else 'id__lt'
+            queryset = queryset.filter(**{lookup: cursor[1]})
+        ids = queryset.order_by('id' if reverse else '-id').values_list(
+            'id', flat=True)[:limit]
+        return [(post_id, 0.0) for post_id in ids]
+
+    def matching_ids(self, terms):
+        return list(self._filter(terms).values_list('id', flat=True))
+
+
+class FTS5Backend(BaseSearchBackend):
+    """
+    Полнотекстовый индекс SQLite FTS5. В виртуальной таблице хранятся
+    основы слов поста, rowid совпадает с id поста. Релевантность
+    считает встроенная функция bm25(): чем меньше значение, тем
+    лучше совпадение.
+    """
+    table = 'posts_post_fts'
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+                f"USING fts5(body, tokenize = 'unicode61')")
+
+    def _execute(self, sql, params=()):
+        try:
+            # точка сохранения нужна, чтобы ошибка об отсутствии таблицы
+            # не сломала внешнюю транзакцию
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+        except OperationalError as error:
+            if 'no such table' not in str(error):
+                raise
+        self.setup()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def index(self, post_id, terms):
+        self._execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                      [post_id])
+        self._execute(
+            f'INSERT INTO {self.table} (rowid, body) VALUES (%s, %s)',
+            [post_id, ' '.join(terms)])
+
+    def remove(self, post_id):
+        self._execute(f'DELETE FROM {self.table} WHERE rowid = %s',
+                      [post_id])
+
+    def clear(self):
+        self._execute(f'DELETE FROM {self.table}')
+
+    def rebuild(self, documents, batch_size=500):
+        self.clear()
+        batch = []
+        with connection.cursor() as cursor:
+            for post_id, terms in documents:
+                batch.append((post_id, ' '.join(terms)))
+                if len(batch) >= batch_size:
+                    self._insert_many(cursor, batch)
+                    batch = []
+            self._insert_many(cursor, batch)
+            # сливаем сегменты индекса после массовой вставки
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+    def _insert_many(self, cursor, rows):
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, body) VALUES (%s, %s)',
+                rows)
+
+    @staticmethod
+    def _match(terms):
+        # каждая основа — отдельная фраза в кавычках, чтобы символы
+        # синтаксиса FTS5 в запросе не разбирались как операторы
+        return ' '.join('"{}"'.format(term.replace('"', '""'))
+                        for term in terms)
+
+    def search(self, terms, limit, cursor=None, reverse=False):
+        params = [self._match(terms)]
+        condition = ''
+        if cursor is not None:
+            score, post_id = cursor
+            if reverse:
+                condition = 'WHERE score < %s OR (score = %s AND id > %s)'
+            else:
+                condition = 'WHERE score > %s OR (score = %s AND id < %s)'
+            params += [score, score, post_id]
+        order = 'score DESC, id' if reverse else 'score, id DESC'
+        params.append(limit)
+        return self._execute(
+            f'SELECT id, score FROM ('
+            f'SELECT rowid AS id, bm25({self.table}) AS score '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+            f') {condition} ORDER BY {order} LIMIT %s',
+            params)
+
+    def matching_ids(self, terms):
+        rows = self._execute(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [self._match(terms)])
+        return [row[0] for row in rows]
@@ -0,0 +1,158 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_init, post_migrate, \
+    post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from posts import (caching, counters, recommendations, search, timeline,
+                   trending)
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def invalidate_post(post, group_ids=()):
+    """
+    Сбрасывает кэш страниц с постом, в том числе лент подписок: в
+    карточке выводится и число комментариев.
+    """
+    namespaces = [
+        caching.INDEX,
+        caching.author_ns(post.author.username),
+        caching.post_ns(post.pk),
+        caching.feed_ns(post.author_id),
+    ]
+    group_ids = {post.group_id, *group_ids} - {None}
+    namespaces += [caching.group_ns(slug) for slug in Group.objects.filter(
+        id__in=group_ids).values_list('slug', flat=True)]
+    caching.bump(*namespaces)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # запоминаем группу, чтобы при переносе поста сбросить и старую
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    # оценка уходит в базу вместе с INSERT
+    if instance._state.adding and not raw:
+        trending.post_created(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+    elif instance._initial_group_id != instance.group_id:
+        counters.change_group(instance._initial_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    invalidate_post(instance, [instance._initial_group_id])
+    instance._initial_group_id = instance.group_id
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+    invalidate_post(instance)
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+        trending.comments_added(instance.post_id, instance.created)
+    invalidate_post(instance.post)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+    # вычесть вклад в логарифмах нельзя без потери точности
+    trending.rebuild([instance.post_id])
+    invalidate_post(instance.post)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    # название группы выводится в карточках всех лент
+    if not raw:
+        caching.bump(caching.INDEX, caching.group_ns(instance.slug))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # каскад удалит подписки и посты раньше самого пользователя,
+    # их сигналы не должны восстанавливать его счётчики
+    counters.user_deleting(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    counters.user_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        timeline.followers_changed(instance.author_id)
+        recommendations.follows_changed(instance.user_id,
+                                        [instance.author_id], followed=True)
+        invalidate_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    if not counters.is_deleting(instance.author_id):
+        timeline.followers_changed(instance.author_id)
+    if not counters.is_deleting(instance.user_id):
+        recommendations.follows_changed(
+            instance.user_id, [instance.author_id], followed=False)
+    invalidate_follow(instance)
+
+
+def invalidate_follow(follow):
+    caching.bump(
+        caching.author_ns(follow.author.username),
+        caching.author_ns(follow.user.username),
+        caching.follow_ns(follow.user_id),
+    )
+
+
+@receiver(user_logged_in)
+def user_logged_in_bump(sender, user, **kwargs):
+    caching.bump(caching.user_ns(user.pk))
+
+
+@receiver(user_logged_out)
+def user_logged_out_bump(sender, user, **kwargs):
+    if user is not None:
+        caching.bump(caching.LOGOUTS, caching.user_ns(user.pk))
+
+
+@receiver(post_migrate)
+def search_setup(sender, **kwargs):
+    """
+    Таблицы поискового индекса не описаны моделями, поэтому создаём их
+    после migrate. Сигнал приходит и после flush: тогда постов уже нет,
+    и индекс тоже нужно очистить.
+    """
+    if sender.name != 'posts':
+        return
+    backend = search.get_backend()
+    backend.setup()
+    if not Post.objects.exists():
+        backend.clear()
@@ -0,0 +1,13 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def owned_by(post, user):
+    """
+    True, если пост принадлежит пользователю. Нужен, чтобы ключ
+    кэша карточки различал только «автор / не автор», а не каждого
+    пользователя.
+    """
+    return user.is_authenticated and post.author_id == user.pk
@@ -7,6 +7,7 @@ from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from sorl.thumbnail import get_thumbnail
 
+from posts import thumbnails
 from posts.models import Post, Group, Follow
 from yatube import settings
 
@@ -152,6 +153,7 @@ class ImageTest(TestCase):
                     group=self.group,
                     image=self.uploaded
                 )
+                thumbnails.generate(post.pk)
                 cache.clear()
                 response_index = self.auth_user_client.get(reverse('index'))
                 response_profile = self.auth_user_client.get(
@@ -211,7 +213,15 @@ class ChacheTest(TestCase):
             group=self.group
         )
         response = self.auth_user_client.get(reverse('index'))
-        self.assertNotContains(response, 'cache')
+        self.assertContains(response, 'cache')
+
+    def test_cache_index_served_from_cache(self):
+        self.auth_user_client.get(reverse('index'))
+        # изменение в обход сигналов не сбрасывает кэш
+        Post.objects.filter(pk=self.post.pk).update(text='updated')
+        response = self.auth_user_client.get(reverse('index'))
+        self.assertContains(response, 'post text1')
+        self.assertNotContains(response, 'updated')
 
 
 class FollowTest(TestCase):
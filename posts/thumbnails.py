@@ -0,0 +1,82 @@
+"""
+Миниатюры постов генерируются сразу после загрузки картинки в фоновом
+пуле потоков, а адрес готовой миниатюры сохраняется в Post.thumbnail,
+набор копий для srcset — в Post.rendition.
+Шаблоны только выводят этот адрес и никогда не ждут обработки картинки.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from posts import renditions
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+# 0 — генерировать синхронно, в потоке запроса
+WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS,
+                                       thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate(post_id):
+    """
+    Строит миниатюру и набор копий картинки поста (posts.renditions)
+    и сохраняет их в посте. Возвращает адрес миниатюры или пустую
+    строку, если картинки нет или её не удалось обработать.
+    """
+    from posts.signals import invalidate_post
+
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is None:
+        return ''
+    url, rendition = '', None
+    if post.image:
+        try:
+            url = get_thumbnail(post.image, GEOMETRY, **OPTIONS).url
+            rendition = renditions.build(post.image)
+        except Exception:
+            logger.exception('Не удалось обработать картинку поста %s',
+                             post_id)
+    same_image = Post.objects.filter(pk=post_id)
+    if post.image:
+        # картинку могли заменить, пока строилась миниатюра
+        same_image = same_image.filter(image=post.image.name)
+    updated = same_image.update(thumbnail=url, rendition=rendition,
+                                edited=timezone.now())
+    if updated and (url != post.thumbnail
+                    or getattr(rendition, 'pk', None) != post.rendition_id):
+        invalidate_post(post)
+    return url
+
+
+def _generate_in_worker(post_id):
+    try:
+        generate(post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """
+    Ставит генерацию миниатюры в очередь после фиксации транзакции.
+    """
+    if WORKERS == 0:
+        transaction.on_commit(lambda: generate(post.pk))
+        return
+    transaction.on_commit(
+        lambda: executor().submit(_generate_in_worker, post.pk))
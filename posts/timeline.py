@@ -0,0 +1,221 @@
+"""
+Лента подписок с разносом постов при записи (fan-out on write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+follow_index читает готовую таблицу TimelineEntry вместо соединения
+Follow и Post. У «знаменитостей» слишком много подписчиков, их посты не
+разносятся, а подмешиваются в ленту при чтении (fan-out on read).
+
+Кто знаменитость, записано в UserStats.celebrity. Автор становится ею
+в followers_changed, как только подписчиков становится
+CELEBRITY_FOLLOWERS, а перестаёт — только опустившись ниже
+DEMOTE_RATIO от порога, иначе каждая подписка и отписка на границе
+меняла бы флаг. Бывшей знаменитости нужно разложить последние посты по
+лентам всех подписчиков, это слишком долго для запроса, поэтому это
+делает demote (rebuild_timelines --demoted по расписанию); до тех пор
+её посты по-прежнему подмешиваются в ленты при чтении.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from posts import caching
+from posts.models import Follow, Post, TimelineEntry, UserStats
+
+CELEBRITY_FOLLOWERS = getattr(settings, 'TIMELINE_CELEBRITY_FOLLOWERS', 1000)
+# знаменитость теряет флаг ниже DEMOTE_RATIO * CELEBRITY_FOLLOWERS
+DEMOTE_RATIO = getattr(settings, 'TIMELINE_DEMOTE_RATIO', 0.8)
+# сколько последних постов автора попадает в ленту при подписке
+BACKFILL_POSTS = getattr(settings, 'TIMELINE_BACKFILL_POSTS', 200)
+BATCH_SIZE = 500
+# порядок ленты из feed_for
+ORDERING = ('-feed_date', '-feed_post')
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+CELEBRITIES_CACHE_TIMEOUT = 60 * 10
+
+
+def celebrity_ids():
+    ids = cache.get(CELEBRITIES_CACHE_KEY)
+    if ids is None:
+        ids = set(UserStats.objects.filter(
+            celebrity=True).values_list('user_id', flat=True))
+        cache.set(CELEBRITIES_CACHE_KEY, ids, CELEBRITIES_CACHE_TIMEOUT)
+    return ids
+
+
+def is_celebrity(author_id):
+    return author_id in celebrity_ids()
+
+
+def _spread(author_id, posts):
+    """
+    Раскладывает posts — пары (id, pub_date) — по лентам всех
+    подписчиков автора.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch += [TimelineEntry(user_id=user_id, post_id=post_id,
+                                pub_date=pub_date)
+                  for post_id, pub_date in posts]
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, batch_size=BATCH_SIZE,
+                                              ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, batch_size=BATCH_SIZE,
+                                      ignore_conflicts=True)
+
+
+def _recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')[:BACKFILL_POSTS])
+
+
+def fan_out(post):
+    """
+    Добавляет новый пост в ленты всех подписчиков автора.
+    """
+    # решает флаг в базе: кэш списка знаменитостей мог устареть
+    if UserStats.objects.filter(user_id=post.author_id,
+                                celebrity=True).exists():
+        return
+    _spread(post.author_id, [(post.pk, post.pub_date)])
+
+
+def _celebrities_changed():
+    cache.delete(CELEBRITIES_CACHE_KEY)
+    caching.bump(caching.CELEBRITIES)
+
+
+def _demote_below():
+    return CELEBRITY_FOLLOWERS * DEMOTE_RATIO
+
+
+def followers_changed(author_id, followers_count=None):
+    """
+    Вызывается после подписки и отписки: автор мог стать знаменитостью.
+    Обратное делает demote вне запроса.
+    """
+    if followers_count is None:
+        followers_count = UserStats.objects.filter(
+            user_id=author_id).values_list(
+            'followers_count', flat=True).first() or 0
+    if followers_count < CELEBRITY_FOLLOWERS:
+        return
+    # меняет флаг только один из одновременных запросов
+    if UserStats.objects.filter(user_id=author_id, celebrity=False).update(
+            celebrity=True):
+        _celebrities_changed()
+
+
+def demote():
+    """
+    Снимает флаг со знаменитостей, у которых подписчиков стало меньше
+    DEMOTE_RATIO от порога, и раскладывает их последние посты по лентам.
+    Возвращает число таких авторов.
+    """
+    demoted = 0
+    for author_id in UserStats.objects.filter(
+            celebrity=True, followers_count__lt=_demote_below(),
+    ).values_list('user_id', flat=True):
+        if not UserStats.objects.filter(
+                user_id=author_id, celebrity=True,
+                followers_count__lt=_demote_below()).update(celebrity=False):
+            continue
+        # новые посты уже разносит fan_out, а читатели, пока посты
+        # раскладываются, видят автора в кэше знаменитостей
+        _spread(author_id, _recent_posts(author_id))
+        demoted += 1
+    if demoted:
+        _celebrities_changed()
+    return demoted
+
+
+def backfill(user_id, author_id):
+    """
+    После подписки переносит в ленту последние посты автора.
+    """
+    if UserStats.objects.filter(user_id=author_id, celebrity=True).exists():
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in _recent_posts(author_id)],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """
+    После отписки убирает посты автора из ленты.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    celebrities = celebrity_ids()
+    if not celebrities:
+        return []
+    return list(Follow.objects.filter(
+        user=user, author_id__in=celebrities).values_list(
+        'author_id', flat=True))
+
+
+def feed_for(user, followed=None):
+    """
+    Посты ленты подписок: разнесённые заранее плюс посты знаменитостей,
+    на которых подписан пользователь (followed_celebrities, если не
+    переданы). Упорядочивать по ORDERING: без знаменитостей это поля
+    самой TimelineEntry, и LIMIT идёт по индексу (user, -pub_date, -post)
+    без сортировки всей ленты.
+    """
+    posts = Post.objects.for_feed()
+    if followed is None:
+        followed = followed_celebrities(user)
+    if followed:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        return posts.filter(
+            Q(id__in=entries) | Q(author_id__in=followed),
+        ).annotate(feed_date=F('pub_date'), feed_post=F('id'))
+    return posts.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post_id'))
+
+
+def feed_count(user, followed):
+    """
+    Число постов feed_for(user, followed) по индексу TimelineEntry, без
+    соединения с постами. None, если в ленте есть посты знаменитостей:
+    их записей в TimelineEntry нет.
+    """
+    if followed:
+        return None
+    return TimelineEntry.objects.filter(user=user).count()
+
+
+def rebuild(users=None):
+    """
+    Пересобирает ленты с нуля по текущим подпискам и заново отмечает
+    знаменитостей по числу подписчиков. Возвращает число обработанных
+    подписок.
+    """
+    UserStats.objects.filter(
+        followers_count__gte=CELEBRITY_FOLLOWERS).update(celebrity=True)
+    UserStats.objects.filter(
+        followers_count__lt=_demote_below()).update(celebrity=False)
+    _celebrities_changed()
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    entries.delete()
+    processed = 0
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        backfill(user_id, author_id)
+        processed += 1
+    return processed
@@ -0,0 +1,139 @@
+"""
+Популярные посты: оценка, затухающая со временем.
+
+Каждое событие — публикация поста или комментарий к нему — даёт вклад
+w * exp(-(now - t) / TAU), оценка поста — сумма вкладов. Её не нужно
+пересчитывать при каждом показе: величина
+
+    ln(Σ w * exp(t / TAU))
+
+отличается от логарифма текущей оценки на одно и то же now / TAU для
+всех постов, поэтому порядок по ней совпадает с порядком по текущей
+оценке. Она не меняется со временем, хранится в Post.trending, и
+популярное читается по индексу (trending, id) с курсорной пагинацией.
+
+Новый комментарий прибавляется одним UPDATE с F-выражением — сложение
+в логарифмах: max(a, b) + ln(1 + exp(-|a - b|)), экспонента при этом не
+переполняется. Вес публикации зависит от числа подписчиков автора;
+подписчики меняются без пересчёта оценок, поэтому rebuild_trending
+стоит запускать по расписанию.
+"""
+import functools
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from posts import caching
+from posts.models import Comment, Post, UserStats
+
+# через сколько секунд вклад события уменьшается вдвое
+HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', 60 * 60 * 24)
+TAU = HALF_LIFE / math.log(2)
+COMMENT_WEIGHT = 1.0
+FOLLOWER_WEIGHT = 0.5
+# точка отсчёта времени, чтобы оценки оставались небольшими числами
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+ORDERING = ('-trending', '-id')
+
+
+def _time(moment):
+    return (moment - EPOCH).total_seconds() / TAU
+
+
+def _log_add(a, b):
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def _log_add_sql(expression, value):
+    value = Value(value, output_field=FloatField())
+    return (Greatest(expression, value)
+            + Ln(Value(1.0) + Exp(-Abs(expression - value))))
+
+
+def post_score(pub_date, followers):
+    """
+    Оценка поста без комментариев: 1 + FOLLOWER_WEIGHT * ln(1 + подписчики).
+    """
+    return math.log(1 + FOLLOWER_WEIGHT * math.log1p(followers)) \
+        + _time(pub_date)
+
+
+def comment_score(created):
+    return math.log(COMMENT_WEIGHT) + _time(created)
+
+
+def post_created(post):
+    """
+    Задаёт оценку нового поста до INSERT. pub_date (auto_now_add) к этому
+    моменту ещё не заполнено, поэтому берётся текущее время — разница в
+    доли миллисекунды меньше точности, с которой сравнивает rebuild.
+    """
+    followers = UserStats.objects.filter(user_id=post.author_id).values_list(
+        'followers_count', flat=True).first() or 0
+    post.trending = post_score(post.pub_date or timezone.now(), followers)
+
+
+def comments_added(post_id, *created):
+    """
+    Добавляет к оценке поста комментарии, написанные в моменты created
+    (по умолчанию — сейчас).
+    """
+    value = functools.reduce(_log_add, map(
+        comment_score, created or [timezone.now()]))
+    Post.objects.filter(pk=post_id).update(
+        trending=_log_add_sql(F('trending'), value))
+
+
+def rebuild(post_ids=None):
+    """
+    Пересчитывает оценки постов post_ids (всех, если None) одним проходом
+    по постам и комментариям и записывает изменившиеся. Возвращает их
+    число.
+    """
+    connection = connections[router.db_for_write(Post)]
+    posts = Post.objects.using(connection.alias).order_by()
+    comments = Comment.objects.using(connection.alias).order_by()
+    stats = UserStats.objects.using(connection.alias)
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+        comments = comments.filter(post_id__in=post_ids)
+        stats = stats.filter(user_id__in=posts.values('author_id'))
+    stored, scores = {}, {}
+    # посты и комментарии читаются из одного снимка базы: иначе
+    # комментарий к посту, созданному между проходами, не нашёл бы его
+    with transaction.atomic(using=connection.alias):
+        followers = dict(stats.values_list(
+            'user_id', 'followers_count').iterator())
+        for post_id, author_id, pub_date, trending in posts.values_list(
+                'id', 'author_id', 'pub_date', 'trending').iterator():
+            stored[post_id] = trending
+            scores[post_id] = post_score(pub_date,
+                                         followers.get(author_id, 0))
+        for post_id, created in comments.values_list(
+                'post_id', 'created').iterator(chunk_size=10000):
+            scores[post_id] = _log_add(scores[post_id],
+                                       comment_score(created))
+
+    # 1e-6 в логарифмах — доли секунды во времени публикации
+    changed = [(score, post_id, stored[post_id])
+               for post_id, score in scores.items()
+               if not math.isclose(stored[post_id], score, abs_tol=1e-6)]
+    # bulk_update строит CASE на каждую порцию и на десятках тысяч
+    # постов в разы медленнее простого executemany. Оценку, которую
+    # после чтения успел поднять новый комментарий, не перезаписываем.
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(Post._meta.db_table)} SET trending = %s '
+            f'WHERE id = %s AND trending = %s', changed)
+    if changed:
+        caching.bump(caching.TRENDING)
+    return len(changed)
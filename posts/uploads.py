@@ -0,0 +1,85 @@
+"""
+Приём картинок: файл пишется на диск по частям, а тип и размеры
+проверяются до того, как Pillow начнёт декодировать картинку.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+MAX_BYTES = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+MAX_PIXELS = getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 40 * 1000 * 1000)
+# картинки крупнее уменьшаются при загрузке, один раз
+MAX_EDGE = getattr(settings, 'IMAGE_UPLOAD_MAX_EDGE', 2560)
+
+# сигнатуры форматов, которые мы принимаем
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+REJECTED_FORMAT = 'format'
+REJECTED_SIZE = 'size'
+
+
+def sniff_format(head):
+    for signature, name in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загрузку во временный файл по частям и перестаёт писать, как
+    только видно, что это не картинка или файл больше MAX_BYTES. Причина
+    сохраняется в атрибуте rejected файла, ошибку показывает форма.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rejected = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.received == 0 and sniff_format(raw_data) is None:
+            self.rejected = REJECTED_FORMAT
+        self.received += len(raw_data)
+        if self.received > MAX_BYTES:
+            self.rejected = REJECTED_SIZE
+        if self.rejected is None:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(self.received)
+        file.rejected = self.rejected
+        return file
+
+
+def shrink(file):
+    """
+    Уменьшает слишком большую картинку до MAX_EDGE по длинной стороне
+    и заодно убирает метаданные (EXIF, в том числе координаты).
+    """
+    file.seek(0)
+    image = Image.open(file)
+    image_format = image.format
+    if image_format == 'JPEG':
+        # JPEG умеет декодироваться сразу в уменьшенном масштабе
+        image.draft('RGB', (MAX_EDGE, MAX_EDGE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_EDGE, MAX_EDGE), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=90)
+    return InMemoryUploadedFile(
+        buffer, getattr(file, 'field_name', None), file.name,
+        Image.MIME.get(image_format), buffer.tell(), None,
+    )
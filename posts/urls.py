@@ -5,8 +5,13 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("new/", views.new_post, name="new_post"),
+    path("trending/", views.trending_posts, name="trending"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
+    path("group/<slug:slug>/trending/", views.group_trending,
+         name="group_trending"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("follow/batch/", views.follow_batch, name="follow_batch"),
+    path("search/", views.search_posts, name="search"),
     # Профайл пользователя
     path('<str:username>/', views.profile, name='profile'),
     path("<str:username>/follow/", views.profile_follow,
@@ -20,6 +25,8 @@ urlpatterns = [
         name='post_edit'
     ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path("<username>/<int:post_id>/comment/", views.add_comment,
          name="add_comment"),
 
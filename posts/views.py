@@ -1,24 +1,32 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
+from posts import (caching, comment_queue, counters, follows,
+                   recommendations, search, thumbnails, timeline, trending)
 from posts.forms import PostForm, CommentForm
 from posts.models import Post, Group, Comment, Follow, User
+from posts.pagination import FEED_ORDERING, CursorPaginator, paginate
+
+COMMENTS_PER_PAGE = 50
+# порядок комментариев: ?order=old (по умолчанию) или ?order=new
+COMMENT_ORDERINGS = {
+    'old': ('created', 'id'),
+    'new': ('-created', '-id'),
+}
 
 
-@cache_page(60 * 20)
+@caching.versioned_page(lambda request: [caching.INDEX])
 def index(request):
-    post_list = Post.objects.order_by('-pub_date').all()
-    paginator = Paginator(post_list, 10)
+    post_list = Post.objects.for_feed().order_by(*FEED_ORDERING)
     # показывать по 10 записей на странице.
-
-    page_number = request.GET.get(
-        'page')  # переменная в URL с номером запрошенной страницы
-    page = paginator.get_page(
-        page_number)  # получить записи с нужным смещением
+    page, paginator = paginate(request, post_list, 10,
+                               count=counters.total_posts())
     return render(
         request,
         'index.html',
@@ -26,15 +34,32 @@ def index(request):
     )
 
 
+@caching.versioned_page(lambda request: [caching.INDEX])
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(query, 10)
+    page = paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    return render(request, 'search.html', {
+        'query': query,
+        'page': page,
+        'paginator': paginator,
+        # ссылки пагинатора должны сохранять строку запроса
+        'params': urlencode({'q': query}) + '&',
+    })
+
+
 @login_required
 def new_post(request):
     context_dict = {'title': 'Добавить запись', 'button': 'Добавить'}
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES or None)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if post.image:
+                thumbnails.schedule(post)
             return redirect('index')
         return render(request, 'new_post.html',
                       {'form': form, 'context_dict': context_dict})
@@ -43,32 +68,66 @@ def new_post(request):
                   {'form': form, 'context_dict': context_dict})
 
 
+@caching.versioned_page(
+    lambda request, slug: [caching.group_ns(slug)])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_posts_list = Post.objects.filter(group=group) \
-        .order_by('-pub_date').all()
-    paginator = Paginator(group_posts_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    group_posts_list = Post.objects.for_feed().filter(group=group) \
+        .order_by(*FEED_ORDERING)
+    page, paginator = paginate(request, group_posts_list, 10,
+                               count=group.posts_count)
     return render(request, 'group.html',
                   {'page': page, 'paginator': paginator, 'group': group})
 
 
+@caching.versioned_page(
+    lambda request: [caching.INDEX, caching.TRENDING])
+def trending_posts(request):
+    # готовый порядок по индексу (trending, id), страницы — по курсору
+    paginator = CursorPaginator(Post.objects.for_feed(), 10,
+                                trending.ORDERING)
+    page = paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    return render(request, 'trending.html',
+                  {'page': page, 'paginator': paginator})
+
+
+@caching.versioned_page(
+    lambda request, slug: [caching.group_ns(slug), caching.TRENDING])
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    paginator = CursorPaginator(Post.objects.for_feed().filter(group=group),
+                                10, trending.ORDERING)
+    page = paginator.get_page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    return render(request, 'trending.html',
+                  {'page': page, 'paginator': paginator, 'group': group})
+
+
+def profile_namespaces(request, username):
+    namespaces = [caching.author_ns(username)]
+    if request.user.is_authenticated:
+        namespaces.append(caching.suggestions_ns(request.user.pk))
+    return namespaces
+
+
+@caching.versioned_page(profile_namespaces)
 def profile(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    post_list = Post.objects.select_related(
-        'author',
-        'group',
-    ).filter(author=author).order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed().filter(
+        author=author).order_by(*FEED_ORDERING)
+    stats = counters.stats_for(author)
+    # число постов уже посчитано в счётчиках — COUNT(*) не нужен
+    page, paginator = paginate(request, post_list, 10,
+                               count=stats.posts_count)
     context = {
         'user': user,
         "author": author,
+        "stats": stats,
         "page": page,
         "paginator": paginator,
+        "suggestions": recommendations.for_user(user),
     }
     if request.user.is_authenticated:
         following = Follow.objects.filter(author=author, user=user).exists()
@@ -77,19 +136,65 @@ def profile(request, username):
     return render(request, 'profile.html', context)
 
 
+def load_comments(request, post_id):
+    """
+    Страница комментариев поста вместе с авторами: одним запросом и не
+    больше COMMENTS_PER_PAGE, сколько бы комментариев ни было у поста.
+    Следующие страницы — по курсору ?after=.
+    """
+    order = request.GET.get('order')
+    if order not in COMMENT_ORDERINGS:
+        order = 'old'
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE,
+                                COMMENT_ORDERINGS[order])
+    page = paginator.get_page(after=request.GET.get('after'))
+    return comments, page, order
+
+
+def post_namespaces(request, username, post_id):
+    namespaces = [caching.post_ns(post_id), caching.author_ns(username)]
+    if comment_queue.enabled() and request.user.is_authenticated:
+        namespaces.append(caching.pending_ns(post_id, request.user.pk))
+    return namespaces
+
+
+@caching.versioned_page(post_namespaces)
 def post_view(request, username, post_id):
     user_auth = request.user
-    user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = Comment.objects.filter(post=post.pk)
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id,
+                             author__username=username)
+    comments, comments_page, order = load_comments(request, post.pk)
+    pending = []
+    if comment_queue.enabled() and user_auth.is_authenticated:
+        pending = comment_queue.pending(post.pk, user_auth)
     form = CommentForm()
     return render(request, 'post.html',
                   {'author': post.author, 'post': post,
+                   'stats': counters.stats_for(post.author),
                    'user_auth': user_auth,
                    'comments': comments,
+                   'comments_page': comments_page,
+                   'pending': pending,
+                   'order': order,
                    'form': form})
 
 
+@caching.versioned_page(post_namespaces)
+def post_comments(request, username, post_id):
+    """
+    Следующая страница комментариев для подгрузки без перезагрузки
+    поста: готовый HTML и курсор следующей страницы.
+    """
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    _, page, order = load_comments(request, post.pk)
+    html = render_to_string('comment_list.html',
+                            {'post': post, 'items': page, 'order': order},
+                            request)
+    return JsonResponse({'html': html, 'next': page.next_cursor})
+
+
 @login_required
 def post_edit(request, username, post_id):
     context_dict = {'title': 'Редактировать запись', 'button': 'Изменить'}
@@ -106,6 +211,8 @@ def post_edit(request, username, post_id):
     if request.method == 'POST':
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('post', username=request.user, post_id=post_id)
     return render(request, 'new_post.html',
                   {
@@ -134,40 +241,77 @@ def server_error(request):
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, pk=post_id, author__username=username)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and comment_queue.enabled():
+        # в базу комментарий перенесёт фоновый поток
+        comment_queue.enqueue(post, request.user, form.cleaned_data['text'])
+    elif form.is_valid():
         comment = form.save(commit=False)
         comment.post = post
-        comment.author = post.author
+        comment.author = request.user
         comment.save()
     return redirect('post', username=username, post_id=post_id)
 
 
+def follow_namespaces(request):
+    # ленту сбрасывают посты любого из авторов, на которых подписан
+    # читатель; их список берём при чтении
+    authors = Follow.objects.filter(user=request.user).values_list(
+        'author_id', flat=True)
+    return [caching.follow_ns(request.user.pk), caching.CELEBRITIES,
+            caching.suggestions_ns(request.user.pk),
+            *(caching.feed_ns(author_id) for author_id in authors)]
+
+
 @login_required
+@caching.versioned_page(follow_namespaces)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user).order_by(
-        '-pub_date')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get(
-        'page')  # переменная в URL с номером запрошенной страницы
-    page = paginator.get_page(
-        page_number)  # получить записи с нужным смещением
+    followed = timeline.followed_celebrities(request.user)
+    posts = timeline.feed_for(request.user, followed).order_by(
+        *timeline.ORDERING)
+    page, paginator = paginate(request, posts, 10,
+                               count=timeline.feed_count(request.user,
+                                                         followed),
+                               ordering=timeline.ORDERING)
     return render(request, "follow.html",
-                  {'page': page, 'paginator': paginator})
+                  {'page': page, 'paginator': paginator,
+                   'suggestions': recommendations.for_user(request.user)})
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user == author or Follow.objects.filter(author=author,
-                                                       user=request.user).exists():
-        return redirect('profile', username=username)
-    follower = Follow.objects.create(user=request.user, author=author)
-    follower.save()
+    follows.follow(request.user, [author])
     return redirect('profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author, user=request.user).delete()
+    follows.unfollow(request.user, [author])
     return redirect('profile', username=username)
+
+
+@login_required
+@require_POST
+def follow_batch(request):
+    """
+    Подписка или отписка от нескольких авторов сразу: action=follow или
+    unfollow и поля author с именами. Отвечает JSON с изменившимися
+    подписками и новыми счётчиками.
+    """
+    action = request.POST.get('action')
+    names = set(request.POST.getlist('author'))
+    if action not in ('follow', 'unfollow'):
+        return JsonResponse({'error': 'action: follow или unfollow'},
+                            status=400)
+    if len(names) > follows.MAX_BATCH:
+        return JsonResponse(
+            {'error': f'не больше {follows.MAX_BATCH} авторов за раз'},
+            status=400)
+    authors = list(User.objects.filter(username__in=names)
+                   .only('id', 'username'))
+    change = follows.follow if action == 'follow' else follows.unfollow
+    result = change(request.user, authors).as_dict()
+    result['unknown'] = sorted(
+        names - {author.username for author in authors})
+    return JsonResponse(result)
@@ -1,4 +1,8 @@
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_queries',
+    'tests.fixtures.fixture_cache',
+    'tests.fixtures.fixture_redis',
+    'tests.fixtures.fixture_sql',
 ]
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Версии кэша страниц завязаны на id объектов, а база между тестами
+    # очищается, поэтому кэш от прошлого теста не должен доживать до нового.
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(monkeypatch, settings, tmp_path):
+    # Фоновый поток миниатюр может писать в базу, когда тест уже
+    # закончился и таблицы очищаются, поэтому в тестах он синхронный.
+    # Миниатюры и загрузки пишутся во временный каталог, а не в media/.
+    from posts import thumbnails
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(thumbnails, 'WORKERS', 0)
@@ -0,0 +1,25 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture
+def query_budget(client):
+    """
+    Проверяет, что страница укладывается в фиксированное число запросов
+    к базе. Возвращает фактическое число запросов, чтобы его можно было
+    сравнить для страниц разного размера.
+    """
+    def check(url, budget, http_client=None):
+        http_client = http_client or client
+        with CaptureQueriesContext(connection) as queries:
+            response = http_client.get(url)
+        assert response.status_code == 200, \
+            f'Страница `{url}` вернула код {response.status_code}'
+        executed = [query['sql'] for query in queries.captured_queries]
+        assert len(executed) <= budget, (
+            f'Страница `{url}` выполнила {len(executed)} запросов '
+            f'при бюджете {budget}:\n' + '\n'.join(executed)
+        )
+        return len(executed)
+    return check
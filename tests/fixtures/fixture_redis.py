@@ -0,0 +1,125 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """
+    Заглушка сервера Redis: понимает протокол RESP и те команды,
+    которыми пользуется yatube.cache_backends.RedisCache.
+    """
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, bool):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, str):
+            self.wfile.write(f'+{value}\r\n'.encode())
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self.reply(item)
+        else:
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            with self.server.lock:
+                self.reply(self.execute(args[0].upper().decode(), args[1:]))
+
+    def alive(self, key):
+        data = self.server.data
+        if key in data and data[key][1] is not None \
+                and data[key][1] < time.monotonic():
+            del data[key]
+        return key in data
+
+    def execute(self, command, args):
+        data = self.server.data
+        if command == 'SELECT':
+            return 'OK'
+        if command == 'GET':
+            return data[args[0]][0] if self.alive(args[0]) else None
+        if command == 'MGET':
+            return [data[key][0] if self.alive(key) else None for key in args]
+        if command == 'SET':
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if b'NX' in options and self.alive(key):
+                return None
+            expires = None
+            if b'PX' in options:
+                ttl = int(args[2 + options.index(b'PX') + 1])
+                expires = time.monotonic() + ttl / 1000
+            data[key] = (value, expires)
+            return 'OK'
+        if command == 'DEL':
+            return sum(data.pop(key, None) is not None for key in args)
+        if command == 'EXISTS':
+            return int(self.alive(args[0]))
+        if command == 'INCRBY':
+            value = int(data[args[0]][0]) + int(args[1]) \
+                if self.alive(args[0]) else int(args[1])
+            expires = data[args[0]][1] if args[0] in data else None
+            data[args[0]] = (str(value).encode(), expires)
+            return value
+        if command == 'EVAL':
+            from yatube.cache_backends import RedisCache
+            # единственный скрипт, который посылает бэкенд
+            assert args[0].decode() == RedisCache.INCR_SCRIPT
+            if not self.alive(args[2]):
+                return None
+            return self.execute('INCRBY', args[2:])
+        if command == 'PEXPIRE':
+            if not self.alive(args[0]):
+                return 0
+            data[args[0]] = (data[args[0]][0],
+                             time.monotonic() + int(args[1]) / 1000)
+            return 1
+        if command == 'PERSIST':
+            if not self.alive(args[0]) or data[args[0]][1] is None:
+                return 0
+            data[args[0]] = (data[args[0]][0], None)
+            return 1
+        if command == 'FLUSHDB':
+            data.clear()
+            return 'OK'
+        return None
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRedisHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedisServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    yield f'redis://{host}:{port}/0'
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,151 @@
+"""
+Аудит SQL в тестах.
+
+Каждый запрос к базе во время GET-запроса тестового клиента записывается и
+приводится к «отпечатку»: без литералов и с одинаковыми списками IN.
+Тест падает, если страница:
+- выполнила один и тот же запрос с теми же параметрами дважды;
+- выполнила запрос с одним отпечатком N_PLUS_ONE и более раз — признак
+  запроса на каждую строку (N+1);
+- превысила бюджет запросов своего view из settings.PERF_BUDGETS.
+
+Пометка @pytest.mark.no_sql_audit отключает проверки для теста.
+В конце прогона выводятся самые медленные запросы по отпечаткам.
+"""
+import re
+import time
+from collections import defaultdict
+
+import pytest
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+N_PLUS_ONE = 3
+TOP_SLOWEST = 10
+# служебные запросы транзакций не относятся к логике страницы
+IGNORED = re.compile(r'^\s*(SAVEPOINT|RELEASE|ROLLBACK|BEGIN|COMMIT)', re.I)
+
+_slowest = defaultdict(lambda: {'count': 0, 'total': 0.0, 'max': 0.0})
+
+
+def fingerprint(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'%s', '?', sql)
+    sql = re.sub(r'\(\s*\?(\s*,\s*\?)*\s*\)', '(...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class PageLog:
+    def __init__(self, path, view):
+        self.path = path
+        self.view = view
+        self.queries = []
+
+    def problems(self):
+        found = []
+        queries = [query for query in self.queries
+                   if not IGNORED.match(query[0])]
+        budgets = getattr(settings, 'PERF_BUDGETS', {})
+        budget = budgets.get(self.view, budgets.get('*', {})).get('queries')
+        if budget is not None and len(queries) > budget:
+            found.append(f'{len(queries)} запросов при бюджете {budget}')
+
+        exact = defaultdict(int)
+        shapes = defaultdict(set)
+        for sql, params in queries:
+            exact[(sql, repr(params))] += 1
+            shapes[fingerprint(sql)].add(repr(params))
+        for (sql, params), count in exact.items():
+            if count > 1:
+                found.append(f'повтор ×{count}: {sql} {params}')
+        for shape, variants in shapes.items():
+            if len(variants) >= N_PLUS_ONE:
+                found.append(f'N+1 ×{len(variants)}: {shape}')
+        if not found:
+            return None
+        listing = '\n'.join(f'    {sql} {params}' for sql, params in queries)
+        return (f'{self.path} ({self.view}):\n  '
+                + '\n  '.join(found) + f'\n  Все запросы:\n{listing}')
+
+
+class SQLAudit:
+    def __init__(self):
+        self.pages = []
+        self.current = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = _slowest[fingerprint(sql)]
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            if self.current is not None:
+                self.current.queries.append((sql, params))
+
+    def started(self, sender, environ=None, **kwargs):
+        path = environ.get('PATH_INFO', '') if environ else ''
+        try:
+            view = resolve(path).view_name
+        except Resolver404:
+            view = 'unresolved'
+        query = environ.get('QUERY_STRING') if environ else ''
+        self.current = PageLog(f'{path}?{query}' if query else path, view)
+        if environ and environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+            # изменения данных проверяются своими тестами, здесь —
+            # только построение страниц
+            self.current = None
+
+    def finished(self, sender, **kwargs):
+        if self.current is not None:
+            self.pages.append(self.current)
+            self.current = None
+
+    def problems(self):
+        return [problem for problem in
+                (page.problems() for page in self.pages) if problem]
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'no_sql_audit: не проверять запросы к базе в тесте')
+
+
+@pytest.fixture(autouse=True)
+def sql_audit(request):
+    audit = SQLAudit()
+    request_started.connect(audit.started, weak=False)
+    request_finished.connect(audit.finished, weak=False)
+    for connection in connections.all():
+        connection.execute_wrappers.append(audit)
+    try:
+        yield audit
+    finally:
+        for connection in connections.all():
+            connection.execute_wrappers.remove(audit)
+        request_started.disconnect(audit.started)
+        request_finished.disconnect(audit.finished)
+    if request.node.get_closest_marker('no_sql_audit'):
+        return
+    problems = audit.problems()
+    if problems:
+        pytest.fail('Проверьте запросы к базе:\n' + '\n\n'.join(problems),
+                    pytrace=False)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _slowest:
+        return
+    terminalreporter.section('Самые медленные запросы (по сумме времени)')
+    ranked = sorted(_slowest.items(), key=lambda item: item[1]['total'],
+                    reverse=True)[:TOP_SLOWEST]
+    for shape, stats in ranked:
+        terminalreporter.write_line(
+            f'{stats["total"] * 1000:8.1f} мс  ×{stats["count"]:<5} '
+            f'max {stats["max"] * 1000:.1f} мс  {shape[:160]}')
@@ -0,0 +1,75 @@
+import pytest
+from django.test import Client
+
+from posts.models import Comment, Follow, Post
+
+
+def fill(author, group, count):
+    for i in range(count):
+        post = Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=author, text='Комментарий')
+
+
+class TestPostsApi:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cursor_pages(self, client, user, group):
+        fill(user, group, 15)
+        response = client.get('/api/v1/posts/', {'group': group.slug})
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['results']) == 10
+        assert data['results'][0]['author'] == user.username
+        assert data['results'][0]['group'] == group.slug
+        assert data['previous'] is None and 'after=' in data['next']
+
+        second = client.get(data['next']).json()
+        assert len(second['results']) == 5
+        assert second['next'] is None
+        ids = [post['id'] for post in data['results'] + second['results']]
+        assert len(set(ids)) == 15
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sparse_fields(self, client, user, group):
+        fill(user, group, 1)
+        data = client.get('/api/v1/posts/', {'fields': 'id,text,nope'}).json()
+        assert set(data['results'][0]) == {'id', 'text'}, \
+            'Проверьте, что ?fields= ограничивает набор полей'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_bounded_queries(self, client, user, group,
+                             django_assert_max_num_queries):
+        fill(user, group, 10)
+        with django_assert_max_num_queries(3):
+            client.get('/api/v1/posts/')
+        with django_assert_max_num_queries(4):
+            client.get(f'/api/v1/posts/{Post.objects.first().id}/comments/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_etag_not_modified(self, client, user, group,
+                               django_assert_num_queries):
+        fill(user, group, 2)
+        response = client.get('/api/v1/posts/')
+        etag = response['ETag']
+        with django_assert_num_queries(0):
+            response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, \
+            'Проверьте, что неизменённая страница отдаёт 304 без запросов'
+
+        Post.objects.create(text='Новый пост', author=user)
+        response = client.get('/api/v1/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+
+class TestFollowsApi:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_only_own_follows(self, user_client, user,
+                              django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        Follow.objects.create(user=author, author=user)
+        assert Client().get('/api/v1/follows/').status_code in (401, 403)
+        data = user_client.get('/api/v1/follows/').json()
+        assert [f['author'] for f in data['results']] == ['Author']
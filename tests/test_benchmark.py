@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+
+from posts import benchmark
+from posts.models import Comment, Follow, Group, Post, User
+from yatube import db
+
+
+class TestGenerateData:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_sizes_and_skew(self):
+        call_command('generate_data', users=50, posts=300, groups=5,
+                     follows_per_user=5, comments_per_post=2, seed=1)
+        assert User.objects.count() == 50
+        assert Post.objects.count() == 300
+        assert Group.objects.count() == 5
+        assert Comment.objects.exists() and Follow.objects.exists()
+        assert not Follow.objects.filter(user_id=F('author_id')).exists()
+        top = User.objects.filter(stats__isnull=False).order_by(
+            '-stats__followers_count').first()
+        assert top.stats.followers_count > Follow.objects.count() / 50 * 3, \
+            'Проверьте, что подписчики распределены с перекосом'
+        dates = list(Post.objects.order_by('id').values_list(
+            'pub_date', flat=True))
+        assert dates == sorted(dates), \
+            'Проверьте, что id постов растут вместе с датой'
+
+
+class TestBenchmark:
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert benchmark.percentile(values, 50) == 50
+        assert benchmark.percentile(values, 99) == 99
+        assert benchmark.percentile([5], 95) == 5
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_writes_json(self, tmp_path):
+        call_command('generate_data', users=20, posts=50, groups=2,
+                     follows_per_user=3, seed=2)
+        output = tmp_path / 'run.json'
+        call_command('benchmark', requests=3, warmup=1, output=str(output))
+        result = json.loads(output.read_text())
+        assert {'index', 'group', 'profile', 'post'} <= set(
+            result['scenarios'])
+        index = result['scenarios']['index']
+        assert index['requests'] == 3
+        assert index['p50_ms'] <= index['p99_ms']
+        assert result['meta']['rows']['posts'] == 50
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_run(self, tmp_path):
+        call_command('generate_data', users=10, posts=20, groups=1,
+                     follows_per_user=2, comments_per_post=1, seed=3)
+        comments = Comment.objects.count()
+        output = tmp_path / 'concurrent.json'
+        call_command('benchmark', concurrent=True, readers=1, writers=1,
+                     duration=0.3, output=str(output))
+        result = json.loads(output.read_text())
+        assert {'concurrent_read', 'concurrent_write'} == set(
+            result['scenarios'])
+        assert result['scenarios']['concurrent_read']['requests'] > 0
+        assert 'journal_mode' in result['meta']['sqlite']
+        assert Comment.objects.count() == comments, \
+            'Проверьте, что комментарии нагрузочного теста удаляются'
+
+
+class TestSQLitePragmas:
+
+    @pytest.mark.django_db
+    def test_pragmas_applied(self, settings):
+        settings.SQLITE_PRAGMAS = {'cache_size': -1234, 'busy_timeout': 777}
+        db.configure_sqlite(None, connection)
+        assert db.pragmas(connection) == {'cache_size': -1234,
+                                          'busy_timeout': 777}
@@ -0,0 +1,157 @@
+import time
+
+import pytest
+from django.test import Client
+from django.utils.http import http_date
+
+from posts import caching
+from posts.models import Comment, Follow, Post
+
+
+class TestVersionedPageCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_cached_until_change(self, client, user):
+        post = Post.objects.create(text='Первый пост', author=user)
+        client.get('/')
+        Post.objects.filter(pk=post.pk).update(text='Тихая правка')
+        response = client.get('/')
+        assert 'Первый пост' in response.content.decode(), \
+            'Проверьте, что главная страница отдаётся из кэша'
+
+        post.text = 'Правка через save'
+        post.save()
+        response = client.get('/')
+        assert 'Правка через save' in response.content.decode(), \
+            'Проверьте, что сохранение поста сбрасывает кэш главной страницы'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_and_post_pages_invalidated(self, client, user, post_with_group):
+        group_url = f'/group/{post_with_group.group.slug}/'
+        post_url = f'/{user.username}/{post_with_group.id}/'
+        client.get(group_url)
+        client.get(post_url)
+        Comment.objects.create(post=post_with_group, author=user,
+                               text='Свежий комментарий')
+        assert '1 комментариев' in client.get(group_url).content.decode()
+        assert 'Свежий комментарий' in client.get(post_url).content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_invalidated(self, user_client, user,
+                                     django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        user_client.get('/follow/')
+        Post.objects.create(text='Пост для подписчиков', author=author)
+        response = user_client.get('/follow/')
+        assert 'Пост для подписчиков' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_not_pushed_to_followers(self, user_client, user,
+                                                 django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Пост автора', author=author)
+        before = caching.get_versions([caching.follow_ns(user.pk),
+                                       caching.feed_ns(author.pk)])
+        Post.objects.create(text='Ещё пост', author=author)
+        after = caching.get_versions([caching.follow_ns(user.pk),
+                                      caching.feed_ns(author.pk)])
+        assert after[0] == before[0] and after[1] != before[1], \
+            'Проверьте, что новый пост не сбрасывает кэш каждого подписчика'
+
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_comment_count(self, user_client, user,
+                                       django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Пост автора', author=author)
+        user_client.get('/follow/')
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        assert '1 комментариев' in \
+            user_client.get('/follow/').content.decode(), \
+            'Проверьте, что комментарий сбрасывает кэш ленты подписок'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_page_key_length(self, rf, user):
+        request = rf.get('/follow/')
+        request.user = user
+        namespaces = [caching.feed_ns(author_id) for author_id in range(500)]
+        assert len(caching.page_key(request, 'follow_index', namespaces)) \
+            < 250, 'Проверьте, что ключ не растёт с числом подписок'
+
+
+class TestConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_not_modified_without_queries(self, client, user, group,
+                                          django_assert_num_queries):
+        Post.objects.create(text='Пост', author=user, group=group)
+        url = f'/group/{group.slug}/'
+        # Last-Modified отдаётся, когда секунда изменения закончилась
+        client.get(url)
+        time.sleep(1)
+        response = client.get(url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, \
+            'Проверьте, что неизменённая страница отдаёт 304'
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        assert response.status_code == 304
+
+        Post.objects.create(text='Новый пост', author=user, group=group)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Проверьте, что после нового поста страница отдаётся целиком'
+        assert response['ETag'] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_last_modified_same_second(self, user):
+        response = Client().get('/')
+        Post.objects.create(text='Пост в ту же секунду', author=user)
+        response = Client().get('/', HTTP_IF_MODIFIED_SINCE=response.get(
+            'Last-Modified', http_date(time.time())))
+        assert response.status_code == 200, \
+            'Проверьте, что изменение в ту же секунду не даёт 304'
+
+        client = Client()
+        time.sleep(1)
+        modified = client.get('/')['Last-Modified']
+        client.force_login(user)
+        response = client.get('/', HTTP_IF_MODIFIED_SINCE=modified)
+        assert response.status_code == 200, \
+            'Проверьте, что после входа страница не подтверждается через 304'
+
+        time.sleep(1)
+        modified = client.get('/')['Last-Modified']
+        client.logout()
+        response = client.get('/', HTTP_IF_MODIFIED_SINCE=modified)
+        assert response.status_code == 200, \
+            'Проверьте, что после выхода страница не подтверждается через 304'
+
+
+class TestPostCardFragments:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_card_shared_between_pages(self, client, user, post_with_group):
+        client.get('/')
+        Post.objects.filter(pk=post_with_group.pk).update(text='Тихая правка')
+        response = client.get(f'/group/{post_with_group.group.slug}/')
+        assert 'Тестовый пост 2' in response.content.decode(), \
+            'Проверьте, что карточка поста берётся из кэша фрагментов'
+
+        post_with_group.refresh_from_db()
+        post_with_group.save()
+        response = client.get(f'/group/{post_with_group.group.slug}/')
+        assert 'Тихая правка' in response.content.decode(), \
+            'Проверьте, что правка поста меняет ключ карточки'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_owner_gets_own_card(self, client, user_client, post):
+        edit_url = f'/{post.author.username}/{post.id}/edit/'
+        assert edit_url in user_client.get('/').content.decode()
+        user_client.logout()
+        assert edit_url not in client.get('/').content.decode(), \
+            'Проверьте, что ссылка на правку не попадает в чужую карточку'
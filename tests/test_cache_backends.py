@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from posts import caching
+from yatube.cache_backends import RedisCache, SQLiteCache
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteCache(str(tmp_path / 'cache.sqlite3'), {})
+    return RedisCache(request.getfixturevalue('redis_server'), {})
+
+
+class TestSharedCacheBackends:
+
+    def test_get_set_delete(self, backend):
+        assert backend.get('missing') is None
+        backend.set('page', {'html': 'Лента'})
+        assert backend.get('page') == {'html': 'Лента'}
+        assert backend.get_many(['page', 'missing']) == {
+            'page': {'html': 'Лента'}}
+        backend.delete('page')
+        assert not backend.has_key('page')
+
+    def test_add_incr_and_expiry(self, backend):
+        assert backend.add('version', 1)
+        assert not backend.add('version', 5), \
+            'Проверьте, что add не перезаписывает существующий ключ'
+        assert backend.incr('version') == 2
+        with pytest.raises(ValueError):
+            backend.incr('missing')
+        backend.set('short', 'value', timeout=0.05)
+        time.sleep(0.1)
+        assert backend.get('short') is None
+
+    def test_shared_between_instances(self, backend, tmp_path):
+        if isinstance(backend, SQLiteCache):
+            other = SQLiteCache(backend._path, {})
+        else:
+            other = RedisCache('redis://%s:%s/0' % backend._address, {})
+        backend.set('shared', 42)
+        assert other.get('shared') == 42
+
+    def test_sqlite_cull(self, tmp_path):
+        backend = SQLiteCache(str(tmp_path / 'cache.sqlite3'), {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_EVERY': 5}})
+        backend.set('version', 1, timeout=None)
+        backend.set('expired', 'value', timeout=0.01)
+        time.sleep(0.02)
+        for i in range(23):
+            backend.set(f'page:{i}', i)
+        rows = backend._connection().execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        assert rows <= 10 + 4, \
+            'Проверьте, что SQLiteCache не растёт больше MAX_ENTRIES'
+        assert backend.get('version') == 1, \
+            'Бессрочные ключи должны вытесняться последними'
+        assert not backend._connection().execute(
+            "SELECT 1 FROM cache WHERE key LIKE '%expired'").fetchone()
+
+
+class TestStampedeProtection:
+
+    def test_cold_key_built_once(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(
+            caching, 'cache', SQLiteCache(str(tmp_path / 'c.sqlite3'), {}))
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return 'страница'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                caching.get_or_build('page:index', build)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ['страница'] * 8
+        assert len(builds) == 1, \
+            'Проверьте, что холодный ключ строится одним запросом'
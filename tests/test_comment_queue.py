@@ -0,0 +1,77 @@
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+from posts import comment_queue
+from posts.models import Comment, Post
+
+
+@pytest.fixture
+def queue(settings, tmp_path):
+    settings.COMMENT_INGESTION = 'queue'
+    settings.COMMENT_QUEUE_PATH = str(tmp_path / 'queue.sqlite3')
+    # переносим вручную, без фонового потока
+    settings.COMMENT_DRAIN_INTERVAL = None
+
+
+class TestCommentQueue:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pending_then_drained(self, queue, user_client, user, post):
+        url = f'/{user.username}/{post.id}/'
+        user_client.get(url)
+        response = user_client.post(f'{url}comment/',
+                                    data={'text': 'Из очереди'})
+        assert response.status_code == 302
+        assert not Comment.objects.exists(), \
+            'Проверьте, что в режиме очереди комментарий не пишется в базу'
+        content = user_client.get(url).content.decode()
+        assert 'Из очереди' in content and 'публикуется' in content, \
+            'Проверьте, что автор сразу видит свой комментарий из очереди'
+        assert 'Из очереди' not in Client().get(url).content.decode()
+
+        assert comment_queue.drain() == 1
+        comment = Comment.objects.get()
+        assert comment.text == 'Из очереди' and comment.author == user
+        assert Post.objects.get(pk=post.pk).comments_count == 1
+        content = user_client.get(url).content.decode()
+        assert content.count('Из очереди') == 1
+        assert 'публикуется' not in content
+        assert 'Из очереди' in Client().get(url).content.decode(), \
+            'Проверьте, что перенос очереди сбрасывает кэш страницы поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_interrupted_drain_not_duplicated(self, queue, user, post,
+                                              monkeypatch):
+        comment_queue.enqueue(post, user, 'Первый')
+        comment_queue.enqueue(post, user, 'Второй')
+        # перенос записал порцию в базу и упал, не удалив её из очереди
+        comment_queue._store(comment_queue._claim(1))
+        monkeypatch.setattr(comment_queue, 'CLAIM_TIMEOUT', -1)
+        assert comment_queue.drain() == 1
+        assert sorted(Comment.objects.values_list('text', flat=True)) == \
+            ['Второй', 'Первый']
+        assert not comment_queue.pending(post.pk, user)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_keeps_repeated_text(self, queue, user, post, monkeypatch):
+        comment_queue.enqueue(post, user, 'Спасибо')
+        queued = comment_queue.pending(post.pk, user)[0].created
+        # перенос взял порцию и упал, ничего не записав,
+        # а автор тем временем отправил тот же текст ещё раз
+        comment_queue._claim(1)
+        Comment.objects.create(post=post, author=user, text='Спасибо')
+        monkeypatch.setattr(comment_queue, 'CLAIM_TIMEOUT', -1)
+        assert comment_queue.drain() == 1
+        assert Comment.objects.filter(text='Спасибо').count() == 2, \
+            'Проверьте, что повтор порции не теряет такой же комментарий'
+        stored = Comment.objects.get(queue_token__isnull=False)
+        assert stored.created == queued, \
+            'Проверьте, что время комментария — время постановки в очередь'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_drain_command(self, queue, user, post, capsys):
+        comment_queue.enqueue(post, user, 'Командой')
+        call_command('drain_comments')
+        assert 'Перенесено комментариев: 1' in capsys.readouterr().out
+        assert Comment.objects.filter(text='Командой').exists()
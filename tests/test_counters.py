@@ -0,0 +1,90 @@
+import pytest
+from django.core.management import call_command
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+
+class TestCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_writes(self, user_client, user, django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        post = Post.objects.create(text='Пост', author=author)
+        user_client.get(f'/{author.username}/follow/')
+        user_client.post(f'/{author.username}/{post.id}/comment/',
+                         {'text': 'Комментарий'})
+
+        author_stats = UserStats.objects.get(user=author)
+        assert author_stats.followers_count == 1
+        assert author_stats.posts_count == 1
+        assert UserStats.objects.get(user=user).following_count == 1
+        post.refresh_from_db()
+        assert post.comments_count == 1
+
+        user_client.get(f'/{author.username}/unfollow/')
+        assert UserStats.objects.get(user=author).followers_count == 0
+        assert UserStats.objects.get(user=user).following_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_uses_counters(self, client, user, post):
+        response = client.get(f'/{user.username}/')
+        assert response.context['stats'].posts_count == 1
+        assert 'Записей: 1' in response.content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_repair_command(self, user, post, django_user_model):
+        reader = django_user_model.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=user)
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        UserStats.objects.filter(user=user).update(followers_count=10,
+                                                   posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+
+        call_command('repair_counters')
+
+        stats = UserStats.objects.get(user=user)
+        assert stats.followers_count == 1
+        assert stats.posts_count == 1
+        post.refresh_from_db()
+        assert post.comments_count == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_posts_count(self, user, group):
+        other = Group.objects.create(title='Другая', slug='other',
+                                     description='Описание')
+        post = Post.objects.create(text='Пост', author=user, group=group)
+        Post.objects.create(text='Без группы', author=user)
+        group.refresh_from_db()
+        assert group.posts_count == 1
+
+        post.group = other
+        post.save()
+        assert Group.objects.get(pk=group.pk).posts_count == 0, \
+            'Проверьте, что перенос поста меняет счётчики обеих групп'
+        assert Group.objects.get(pk=other.pk).posts_count == 1
+
+        Group.objects.filter(pk=other.pk).update(posts_count=7)
+        call_command('repair_counters')
+        assert Group.objects.get(pk=other.pk).posts_count == 1
+        post.delete()
+        assert Group.objects.get(pk=other.pk).posts_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_delete_user(self, user, django_user_model):
+        reader = django_user_model.objects.create_user(username='Reader')
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=reader, author=author)
+        Follow.objects.create(user=author, author=user)
+        post = Post.objects.create(text='Пост', author=author)
+        Comment.objects.create(post=post, author=reader, text='Комментарий')
+        Comment.objects.create(post=post, author=author, text='Ответ')
+
+        author.delete()
+        assert not UserStats.objects.filter(user_id=author.pk).exists(), \
+            'Проверьте, что счётчики удалённого пользователя не пересоздаются'
+        assert UserStats.objects.get(user=reader).following_count == 0
+        assert UserStats.objects.get(user=user).followers_count == 0
+
+        reader.delete()
+        assert list(UserStats.objects.values_list('user_id', flat=True)) \
+            == [user.pk]
@@ -0,0 +1,90 @@
+import pytest
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Follow, Post
+from posts.pagination import (CursorPage, CursorPaginator, FEED_ORDERING,
+                              elided_page_range)
+
+
+def create_posts(author, count, group=None):
+    return [Post.objects.create(text=f'Пост {i}', author=author, group=group)
+            for i in range(count)]
+
+
+class TestCursorPaginator:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walk_forward_and_back(self, user):
+        posts = create_posts(user, 25)
+        expected = sorted(posts, key=lambda p: (p.pub_date, p.id), reverse=True)
+        paginator = CursorPaginator(
+            Post.objects.order_by(*FEED_ORDERING), 10)
+
+        first = paginator.get_page()
+        assert [p.id for p in first] == [p.id for p in expected[:10]]
+        assert first.has_next() and not first.has_previous()
+
+        second = paginator.get_page(after=first.next_cursor)
+        assert [p.id for p in second] == [p.id for p in expected[10:20]]
+        third = paginator.get_page(after=second.next_cursor)
+        assert [p.id for p in third] == [p.id for p in expected[20:]]
+        assert not third.has_next() and third.has_previous()
+
+        back = paginator.get_page(before=third.previous_cursor)
+        assert [p.id for p in back] == [p.id for p in second]
+        assert back.has_previous() and back.has_next()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_broken_cursor_returns_first_page(self, user):
+        create_posts(user, 3)
+        paginator = CursorPaginator(
+            Post.objects.order_by(*FEED_ORDERING), 10)
+        page = paginator.get_page(after='не-курсор')
+        assert len(page) == 3
+        assert not page.has_previous()
+
+
+class TestElidedPageRange:
+
+    def test_window(self):
+        paginator = Paginator(range(100000), 10)
+        assert elided_page_range(paginator, 1) == \
+            [1, 2, 3, 4, None, 9999, 10000]
+        assert elided_page_range(paginator, 500) == \
+            [1, 2, None, 497, 498, 499, 500, 501, 502, 503, None, 9999, 10000]
+        assert elided_page_range(Paginator(range(50), 10), 3) == \
+            [1, 2, 3, 4, 5]
+
+
+class TestCursorPaginationView:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feeds_without_post_count(self, user_client, user, group,
+                                      django_user_model):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        create_posts(author, 15, group=group)
+        for url in ('/', f'/group/{group.slug}/', '/follow/'):
+            with CaptureQueriesContext(connection) as queries:
+                response = user_client.get(url)
+            assert response.context['paginator'].count == 15
+            assert not [q for q in queries if 'COUNT(*)' in q['sql']
+                        and 'FROM "posts_post"' in q['sql']], \
+                f'Проверьте, что {url} берёт число постов из счётчиков'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_feed_follows_cursor(self, client, user, group):
+        create_posts(user, 15, group=group)
+        response = client.get(f'/group/{group.slug}/')
+        page = response.context['page']
+        assert page.next_cursor, \
+            'Проверьте, что первая страница группы отдаёт курсор следующей'
+        assert f'?after={page.next_cursor}' in response.content.decode()
+
+        response = client.get(f'/group/{group.slug}/?after={page.next_cursor}')
+        cursor_page = response.context['page']
+        assert type(cursor_page) == CursorPage
+        assert len(cursor_page) == 5
+        assert not set(p.id for p in cursor_page) & set(p.id for p in page)
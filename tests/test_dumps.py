@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from posts import dumps
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@pytest.fixture
+def site(user, group, django_user_model):
+    author = django_user_model.objects.create_user(username='Author')
+    Follow.objects.create(user=user, author=author)
+    posts = [Post.objects.create(text=f'Пост {i}', author=author,
+                                 group=group if i % 2 else None)
+             for i in range(5)]
+    for post in posts:
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+    return posts
+
+
+def wipe():
+    for model in (Comment, Follow, Post, Group, User):
+        model.objects.all().delete()
+
+
+class TestDumps:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_round_trip(self, site, tmp_path):
+        path = tmp_path / 'dump.ndjson'
+        pub_dates = {post.id: post.pub_date for post in site}
+        call_command('export_yatube', output=str(path))
+        wipe()
+
+        call_command('import_yatube', str(path), batch_size=2)
+        assert Post.objects.count() == 5 and Comment.objects.count() == 5
+        assert Follow.objects.filter(user__username='TestUser',
+                                     author__username='Author').exists()
+        for post in Post.objects.select_related('author'):
+            assert post.pub_date == pub_dates[post.id], \
+                'Проверьте, что даты постов сохраняются при загрузке'
+            assert post.comments_count == 1
+        assert Post.objects.filter(group__slug='test-link').count() == 2
+        assert not (tmp_path / 'dump.ndjson.checkpoint').exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_resume_after_failure(self, site, tmp_path, monkeypatch):
+        path = tmp_path / 'dump.ndjson'
+        call_command('export_yatube', output=str(path))
+        wipe()
+
+        build_comments = dumps.Importer.build_comments
+
+        def broken(self, records):
+            raise ValueError('сбой')
+
+        monkeypatch.setattr(dumps.Importer, 'build_comments', broken)
+        with pytest.raises(CommandError):
+            call_command('import_yatube', str(path), batch_size=2)
+        assert Post.objects.count() == 5 and not Comment.objects.exists()
+        checkpoint = json.loads(
+            (tmp_path / 'dump.ndjson.checkpoint').read_text())
+        assert checkpoint['offset'] == path.read_bytes().index(
+            b'{"type": "comment"')
+
+        monkeypatch.setattr(dumps.Importer, 'build_comments', build_comments)
+        Post.objects.filter(id=site[0].id).delete()
+        call_command('import_yatube', str(path), batch_size=2, resume=True)
+        assert Post.objects.count() == 4, \
+            'Проверьте, что продолжение не загружает файл с начала'
+        assert Comment.objects.count() == 4
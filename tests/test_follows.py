@@ -0,0 +1,60 @@
+import pytest
+
+from posts import follows
+from posts.models import Follow, Post, UserStats
+
+
+@pytest.fixture
+def authors(django_user_model):
+    return [django_user_model.objects.create_user(username=f'Author{i}')
+            for i in range(3)]
+
+
+class TestFollowService:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_idempotent(self, user, authors):
+        Post.objects.create(text='Пост автора', author=authors[0])
+        first = follows.follow(user, [authors[0], user])
+        assert first.changed == [authors[0]]
+        assert first.following_count == 1
+        assert first.followers_count == {authors[0].pk: 1}
+
+        again = follows.follow(user, [authors[0]])
+        assert again.changed == [], \
+            'Проверьте, что повторная подписка ничего не меняет'
+        assert Follow.objects.count() == 1
+        assert UserStats.objects.get(user=user).following_count == 1
+        assert user.timeline.count() == 1, \
+            'Проверьте, что после подписки посты автора попадают в ленту'
+
+        gone = follows.unfollow(user, [authors[0]])
+        assert gone.following_count == 0 and not Follow.objects.exists()
+        assert user.timeline.count() == 0
+        assert follows.unfollow(user, [authors[0]]).changed == []
+        assert UserStats.objects.get(user=authors[0]).followers_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_batch_endpoint(self, user_client, user, authors):
+        Follow.objects.create(user=user, author=authors[0])
+        response = user_client.post('/follow/batch/', {
+            'action': 'follow',
+            'author': [a.username for a in authors] + ['nobody'],
+        })
+        data = response.json()
+        assert sorted(data['changed']) == ['Author1', 'Author2']
+        assert data['following_count'] == 3
+        assert data['followers_count'] == {'Author1': 1, 'Author2': 1}
+        assert data['unknown'] == ['nobody']
+
+        data = user_client.post('/follow/batch/', {
+            'action': 'unfollow', 'author': ['Author0', 'Author1'],
+        }).json()
+        assert sorted(data['changed']) == ['Author0', 'Author1']
+        assert data['following_count'] == 1
+        assert list(Follow.objects.values_list(
+            'author__username', flat=True)) == ['Author2']
+
+        assert user_client.get('/follow/batch/').status_code == 405
+        assert user_client.post('/follow/batch/', {
+            'action': 'delete'}).status_code == 400
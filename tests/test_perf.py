@@ -0,0 +1,74 @@
+import pytest
+
+from posts.models import Post
+from yatube import metrics
+from tests.fixtures.fixture_sql import N_PLUS_ONE, PageLog, fingerprint
+from yatube.middleware import PerformanceBudgetExceeded
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.registry.clear()
+
+
+class TestPerformanceMiddleware:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_server_timing(self, client, user):
+        Post.objects.create(text='Пост', author=user)
+        timing = client.get('/')['Server-Timing']
+        assert 'total;dur=' in timing and 'tpl;dur=' in timing
+        assert 'queries"' in timing and 'miss' in timing
+        timing = client.get('/')['Server-Timing']
+        assert 'desc="0 queries"' in timing, \
+            'Проверьте, что страница из кэша не ходит в базу'
+        assert 'hit 0,' not in timing
+
+    @pytest.mark.django_db(transaction=True)
+    def test_prometheus_endpoint(self, client, user, settings):
+        client.get('/')
+        client.get('/')
+        assert client.get('/admin/metrics/').status_code == 403, \
+            'Проверьте, что по умолчанию метрики закрыты даже для 127.0.0.1'
+        settings.METRICS_TOKEN = 'секрет'
+        assert client.get('/admin/metrics/',
+                          HTTP_AUTHORIZATION='Bearer чужой').status_code == 403
+        text = client.get('/admin/metrics/',
+                          HTTP_AUTHORIZATION='Bearer секрет').content.decode()
+        assert 'yatube_requests_total{view="index",method="GET",' \
+               'status="200"} 2' in text
+        assert 'yatube_request_duration_seconds_count{view="index"} 2' \
+            in text
+        assert 'yatube_db_queries_total{view="index"}' in text
+        assert 'view="metrics"' not in text
+
+    @pytest.mark.no_sql_audit
+    @pytest.mark.django_db(transaction=True)
+    def test_query_budget(self, client, user, settings, caplog):
+        settings.PERF_BUDGETS = {'index': {'queries': 0}}
+        settings.PERF_BUDGET_ACTION = 'raise'
+        with pytest.raises(PerformanceBudgetExceeded):
+            client.get('/')
+
+        settings.PERF_BUDGET_ACTION = 'log'
+        client.get('/?page=1')
+        assert 'при бюджете 0' in caplog.text
+        assert 'yatube_budget_exceeded_total{view="index",kind="queries"} 2' \
+            in metrics.registry.render()
+
+
+class TestSQLAudit:
+
+    def test_fingerprint(self):
+        assert fingerprint("SELECT 1 FROM t WHERE a = 'x' AND id IN (1, 2)") \
+            == fingerprint("SELECT 7 FROM t WHERE a = 'y' AND id IN (3)")
+
+    def test_problems(self):
+        page = PageLog('/', 'index')
+        page.queries = [('SELECT * FROM t WHERE id = %s', (i,))
+                        for i in range(N_PLUS_ONE)]
+        page.queries.append(page.queries[0])
+        problems = page.problems()
+        assert 'N+1' in problems and 'повтор ×2' in problems, \
+            'Проверьте, что аудит находит N+1 и повторы запросов'
+        assert PageLog('/', 'index').problems() is None
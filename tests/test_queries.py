@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+
+from posts.models import Comment, Follow, Post
+
+
+def fill(author, group, count):
+    for i in range(count):
+        post = Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        Comment.objects.create(post=post, author=author, text='Комментарий')
+
+
+class TestFeedQueryBudget:
+    """
+    Число запросов на страницу ленты не должно зависеть
+    от количества постов на ней.
+    """
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('url', ['/', '/group/test-link/', '/TestUser/'])
+    def test_feed_pages(self, client, user, group, query_budget, url):
+        fill(user, group, 1)
+        cache.clear()
+        small = query_budget(url, 8)
+        fill(user, group, 9)
+        cache.clear()
+        full = query_budget(url, 8)
+        assert small == full, \
+            f'Проверьте, что на странице `{url}` нет запросов на каждый пост'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed(self, user_client, user, group, django_user_model,
+                         query_budget):
+        author = django_user_model.objects.create_user(username='Author')
+        Follow.objects.create(user=user, author=author)
+        fill(author, group, 1)
+        cache.clear()
+        small = query_budget('/follow/', 8, user_client)
+        fill(author, group, 9)
+        cache.clear()
+        full = query_budget('/follow/', 8, user_client)
+        assert small == full, \
+            'Проверьте, что на странице `/follow/` нет запросов на каждый пост'
+
+
+class TestPostComments:
+    """
+    Страница поста показывает комментарии страницами, и число запросов
+    не зависит от количества комментариев.
+    """
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_paginated(self, client, user, post, query_budget):
+        from posts import views
+
+        url = f'/{user.username}/{post.id}/'
+        Comment.objects.create(post=post, author=user, text='Комментарий 0')
+        small = query_budget(url, 12)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=user, text=f'Комментарий {i}')
+            for i in range(1, views.COMMENTS_PER_PAGE + 5))
+        cache.clear()
+        full = query_budget(url, 12)
+        assert small == full, \
+            'Проверьте, что авторы комментариев загружаются одним запросом'
+        cache.clear()
+        page = client.get(url).context['comments_page']
+        assert len(page) == views.COMMENTS_PER_PAGE and page.next_cursor
+
+        rest = client.get(f'/{user.username}/{post.id}/comments/',
+                          {'after': page.next_cursor}).json()
+        assert rest['next'] is None
+        assert rest['html'].count('name="comment_') == 5, \
+            'Проверьте, что подгружается следующая страница комментариев'
+
+        newest = client.get(url, {'order': 'new'}).context['comments_page']
+        assert newest[0].text == f'Комментарий {views.COMMENTS_PER_PAGE + 4}'
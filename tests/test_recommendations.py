@@ -0,0 +1,67 @@
+import pytest
+from django.core.management import call_command
+
+from posts import follows, recommendations
+from posts.models import Follow, Post, StaleSuggestions, Suggestion
+from posts.recommendations import FollowGraph
+
+
+@pytest.fixture
+def people(django_user_model):
+    return {name: django_user_model.objects.create_user(username=name)
+            for name in ('reader', 'a', 'b', 'c', 'd', 'e')}
+
+
+def follow_all(pairs, people):
+    Follow.objects.bulk_create(
+        Follow(user=people[user], author=people[author])
+        for user, author in pairs)
+
+
+class TestFollowGraph:
+
+    def test_csr(self):
+        graph = FollowGraph([(1, 9), (1, 5), (5, 1), (7, 9)])
+
+        def following(user_id):
+            node = graph.number[user_id]
+            return sorted(graph.ids[i] for i in graph.following(node))
+        assert following(1) == [5, 9]
+        assert following(5) == [1]
+        assert following(7) == [9]
+        assert following(9) == []
+
+
+class TestRecommendations:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_scores(self, people, group):
+        follow_all([('reader', 'a'), ('reader', 'b'), ('a', 'c'),
+                    ('b', 'c'), ('a', 'd'), ('a', 'reader')], people)
+        Post.objects.create(text='Пост a', author=people['a'], group=group)
+        Post.objects.create(text='Пост e', author=people['e'], group=group)
+        recommendations.build()
+        suggested = list(Suggestion.objects.filter(
+            user=people['reader']).order_by('-score').values_list(
+            'author__username', 'score'))
+        assert suggested == [('c', 2), ('d', 1), ('e', 0.5)], \
+            'Проверьте оценки: общие подписки и пересечение групп'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_incremental_refresh(self, people, client):
+        follow_all([('reader', 'a'), ('a', 'c'), ('c', 'd')], people)
+        call_command('build_recommendations')
+        reader = people['reader']
+        assert recommendations.for_user(reader) == [people['c']]
+
+        client.force_login(reader)
+        assert 'Кого почитать' in client.get('/follow/').content.decode()
+        follows.follow(reader, [people['c']])
+        assert recommendations.for_user(reader) == [], \
+            'Проверьте, что после подписки автор сразу пропадает из рекомендаций'
+        assert StaleSuggestions.objects.filter(user=reader).exists()
+        assert 'Кого почитать' not in client.get('/follow/').content.decode()
+
+        call_command('build_recommendations', stale=True)
+        assert recommendations.for_user(reader) == [people['d']]
+        assert not StaleSuggestions.objects.exists()
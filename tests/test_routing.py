@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+from django.db import connection, connections
+from django.test import Client
+
+from posts.models import Post
+
+REPLICA = 'replica'
+
+
+@pytest.fixture
+def replica(transactional_db, tmp_path, settings):
+    """
+    Второй файл SQLite вместо реплики. sync() копирует в него основную
+    базу — «репликация» происходит только по вызову.
+    """
+    connections.databases[REPLICA] = {
+        **connections.databases['default'],
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    connections.ensure_defaults(REPLICA)
+    connections.prepare_test_settings(REPLICA)
+    settings.DATABASE_REPLICAS = [REPLICA]
+
+    def sync():
+        connections[REPLICA].close()
+        connection.ensure_connection()
+        target = sqlite3.connect(connections.databases[REPLICA]['NAME'])
+        connection.connection.backup(target)
+        target.close()
+
+    sync()
+    yield sync
+    connections[REPLICA].close()
+    delattr(connections._connections, REPLICA)
+    del connections.databases[REPLICA]
+
+
+class TestReplicaRouting:
+
+    def test_read_views_use_replica(self, replica, user):
+        Post.objects.create(text='Старый пост', author=user)
+        replica()
+        Post.objects.create(text='Пост не на реплике', author=user)
+        content = Client().get('/').content.decode()
+        assert 'Старый пост' in content
+        assert 'Пост не на реплике' not in content, \
+            'Проверьте, что главная страница читает с реплики'
+
+    def test_replica_page_not_validated(self, replica, user, client):
+        replica()
+        response = Client().get('/')
+        assert 'ETag' not in response and 'Last-Modified' not in response, \
+            'Страница с реплики не должна получать ETag основной базы'
+
+        client.force_login(user)
+        client.post('/new/', data={'text': 'Запись'})
+        response = client.get('/')
+        assert 'ETag' in response, \
+            'Проверьте, что страница из основной базы получает ETag'
+
+    def test_writer_reads_own_writes(self, replica, user, client):
+        client.force_login(user)
+        replica()
+        response = client.post('/new/', data={'text': 'Только что'})
+        assert response.status_code == 302
+        assert 'yatube_primary' in response.cookies, \
+            'Проверьте, что после записи клиент читает из основной базы'
+        assert 'Только что' in client.get(
+            f'/{user.username}/').content.decode()
+        assert 'Только что' not in Client().get(
+            f'/{user.username}/').content.decode(), \
+            'Проверьте, что остальные читают с реплики'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_no_replicas(self, client, user):
+        Post.objects.create(text='Пост', author=user)
+        response = client.get('/')
+        assert 'Пост' in response.content.decode()
+        assert 'yatube_primary' not in response.cookies
@@ -0,0 +1,79 @@
+import pytest
+from django.core.management import call_command
+
+from posts import search
+from posts.models import Post
+from posts.search.backends import SimpleBackend
+from posts.search.stemmer import stem
+
+
+class TestStemmer:
+
+    def test_word_forms_share_stem(self):
+        assert stem('кошками') == stem('кошка') == stem('кошки')
+        assert stem('программирования') == stem('программирование')
+        assert stem('Ёлки') == stem('елка')
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_follows_save_and_delete(self, user):
+        post = Post.objects.create(text='Кошки любят молоко', author=user)
+        ids = [p.id for p in search.SearchPaginator('кошка', 10).get_page()]
+        assert ids == [post.id], \
+            'Проверьте, что поиск находит пост по другой форме слова'
+
+        post.text = 'Собаки любят кости'
+        post.save()
+        assert not len(search.SearchPaginator('кошка', 10).get_page()), \
+            'Проверьте, что после редактирования индекс обновляется'
+        assert len(search.SearchPaginator('собакам', 10).get_page()) == 1
+
+        post.delete()
+        assert search.matching_ids('собака') == [], \
+            'Проверьте, что удалённый пост пропадает из индекса'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ranking_and_cursor(self, user):
+        weak = Post.objects.create(
+            text='Кот. ' + 'Про погоду и дорогу. ' * 10, author=user)
+        strong = Post.objects.create(text='Кот кот котов', author=user)
+        others = [Post.objects.create(text=f'Кот номер {i}', author=user)
+                  for i in range(12)]
+        paginator = search.SearchPaginator('коты', 10)
+        first = paginator.get_page()
+        assert first[0].id == strong.id, \
+            'Проверьте, что результаты отсортированы по релевантности'
+        second = paginator.get_page(after=first.next_cursor)
+        found = [p.id for p in first] + [p.id for p in second]
+        assert sorted(found) == sorted(
+            [weak.id, strong.id] + [p.id for p in others])
+        assert not second.has_next() and second.has_previous()
+        back = paginator.get_page(before=second.previous_cursor)
+        assert [p.id for p in back] == [p.id for p in first]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_view_keeps_query_in_links(self, client, user):
+        for i in range(12):
+            Post.objects.create(text=f'Новости дня {i}', author=user)
+        response = client.get('/search/', {'q': 'новость'})
+        page = response.context['page']
+        assert len(page) == 10
+        assert f'?q=%D0%BD%D0%BE%D0%B2%D0%BE%D1%81%D1%82%D1%8C&amp;after=' \
+               f'{page.next_cursor}' in response.content.decode(), \
+            'Проверьте, что ссылка на следующую страницу сохраняет запрос'
+        response = client.get('/search/', {'q': '"OR ('})
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_and_simple_backend(self, user, monkeypatch):
+        post = Post.objects.create(text='Весенний дождь', author=user)
+        search.get_backend().clear()
+        assert search.matching_ids('дожди') == []
+        call_command('rebuild_search_index')
+        assert search.matching_ids('дожди') == [post.id]
+
+        monkeypatch.setattr(search, 'get_backend', SimpleBackend)
+        page = search.SearchPaginator('ДОЖДЯМИ', 10).get_page()
+        assert [p.id for p in page] == [post.id]
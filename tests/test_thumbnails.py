@@ -0,0 +1,90 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from posts import renditions, thumbnails
+from posts.models import ImageRendition, Post
+
+
+def image_upload(name='photo.png', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class TestThumbnails:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_generates_thumbnail(self, user_client, user, settings,
+                                          tmp_path, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        monkeypatch.setattr(thumbnails, 'WORKERS', 0)
+        user_client.post('/new/', {'text': 'С картинкой',
+                                   'image': image_upload()})
+        post = Post.objects.get(text='С картинкой')
+        assert post.thumbnail, \
+            'Проверьте, что после загрузки картинки строится миниатюра'
+
+        response = user_client.get('/')
+        assert post.thumbnail in response.content.decode(), \
+            'Проверьте, что лента выводит сохранённую миниатюру'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_does_not_render_thumbnails(self, client, user, settings,
+                                             tmp_path, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = Post.objects.create(text='Без миниатюры', author=user,
+                                   image=image_upload())
+        monkeypatch.setattr(thumbnails, 'get_thumbnail', None)
+        response = client.get('/')
+        assert post.image.url in response.content.decode(), \
+            'Пока миниатюры нет, в ленте должна быть исходная картинка'
+
+
+class TestRenditions:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_srcset_and_dedup(self, client, user, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        first = Post.objects.create(text='Первый', author=user,
+                                    image=image_upload('a.png'))
+        second = Post.objects.create(text='Второй', author=user,
+                                     image=image_upload('b.png'))
+        thumbnails.generate(first.pk)
+        thumbnails.generate(second.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert first.rendition_id == second.rendition_id, \
+            'Одинаковые картинки должны обрабатываться один раз'
+        assert first.rendition.widths == '480,960'
+        assert 'webp' in first.rendition.formats.split(',')
+
+        content = client.get('/').content.decode()
+        assert 'type="image/webp"' in content
+        assert '960.webp 960w' in content
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_build_leaves_no_orphans(self, user, settings,
+                                                tmp_path, monkeypatch):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = Post.objects.create(text='Пост', author=user,
+                                   image=image_upload())
+        rendition = renditions.build(post.image)
+        files = sorted(p.name for p in (tmp_path / 'renditions').rglob('*.*'))
+        # второй поток проверил наличие файлов раньше, чем их записал первый
+        ImageRendition.objects.all().delete()
+        exists, checked = default_storage.exists, set()
+
+        def exists_once(name):
+            if name in checked:
+                return exists(name)
+            checked.add(name)
+            return False
+        monkeypatch.setattr(default_storage, 'exists', exists_once)
+        assert renditions.build(post.image).digest == rendition.digest
+        assert sorted(p.name for p in
+                      (tmp_path / 'renditions').rglob('*.*')) == files, \
+            'Проверьте, что повторная запись копии не оставляет лишних файлов'
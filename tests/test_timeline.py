@@ -0,0 +1,107 @@
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(username='Author')
+
+
+class TestTimeline:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_backfill_prune(self, user_client, user, author):
+        old = Post.objects.create(text='Старый пост', author=author)
+        user_client.get(f'/{author.username}/follow/')
+        assert TimelineEntry.objects.filter(user=user, post=old).exists(), \
+            'Проверьте, что при подписке лента заполняется постами автора'
+
+        new = Post.objects.create(text='Новый пост', author=author)
+        assert TimelineEntry.objects.filter(user=user, post=new).exists(), \
+            'Проверьте, что новый пост попадает в ленты подписчиков'
+        response = user_client.get('/follow/')
+        assert len(response.context['page']) == 2
+
+        user_client.get(f'/{author.username}/unfollow/')
+        assert not TimelineEntry.objects.filter(user=user).exists(), \
+            'Проверьте, что после отписки посты автора убираются из ленты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_fan_out_on_read(self, user_client, user, author,
+                                       monkeypatch):
+        monkeypatch.setattr(timeline, 'CELEBRITY_FOLLOWERS', 1)
+        cache.clear()
+        Follow.objects.create(user=user, author=author)
+        cache.clear()
+        Post.objects.create(text='Пост знаменитости', author=author)
+        assert not TimelineEntry.objects.exists(), \
+            'Посты знаменитостей не должны разноситься по лентам'
+        response = user_client.get('/follow/')
+        assert len(response.context['page']) == 1
+        cache.clear()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_demoted(self, user, author, django_user_model,
+                               monkeypatch):
+        monkeypatch.setattr(timeline, 'CELEBRITY_FOLLOWERS', 2)
+        fan = django_user_model.objects.create_user(username='Fan')
+        Follow.objects.create(user=user, author=author)
+        Follow.objects.create(user=fan, author=author)
+        post = Post.objects.create(text='Пост знаменитости', author=author)
+        assert list(timeline.feed_for(user)) == [post]
+        assert not TimelineEntry.objects.exists()
+
+        Follow.objects.filter(user=fan).delete()
+        assert timeline.is_celebrity(author.pk), \
+            'Проверьте, что отписка не раскладывает посты в запросе'
+        assert list(timeline.feed_for(user)) == [post]
+
+        call_command('rebuild_timelines', '--demoted')
+        assert not timeline.is_celebrity(author.pk)
+        assert list(timeline.feed_for(user)) == [post], \
+            'Проверьте, что посты бывшей знаменитости остаются в лентах'
+        assert TimelineEntry.objects.filter(user=user, post=post).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_hysteresis(self, user, author, django_user_model,
+                                  monkeypatch):
+        monkeypatch.setattr(timeline, 'CELEBRITY_FOLLOWERS', 5)
+        fans = [django_user_model.objects.create_user(username=f'Fan{i}')
+                for i in range(5)]
+        for fan in fans:
+            Follow.objects.create(user=fan, author=author)
+        assert timeline.is_celebrity(author.pk)
+        Follow.objects.filter(user=fans[0]).delete()
+        assert timeline.demote() == 0, \
+            'Проверьте, что автор у порога остаётся знаменитостью'
+        Follow.objects.filter(user=fans[1]).delete()
+        assert timeline.demote() == 1
+        assert not timeline.is_celebrity(author.pk)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feed_uses_timeline_index(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=author)
+        feed = timeline.feed_for(user).order_by(*timeline.ORDERING)
+        assert [p.text for p in feed] == ['Пост 2', 'Пост 1', 'Пост 0']
+        sql, params = feed.all()[:10].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        assert 'TEMP B-TREE' not in plan, \
+            'Проверьте, что лента подписок не сортирует все записи читателя'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_command(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='Пост 1', author=author)
+        Post.objects.create(text='Пост 2', author=author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines')
+        assert TimelineEntry.objects.filter(user=user).count() == 2
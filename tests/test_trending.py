@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Post
+
+
+def publish(user, text, hours_ago=0, group=None):
+    post = Post.objects.create(text=text, author=user, group=group)
+    Post.objects.filter(pk=post.pk).update(
+        pub_date=timezone.now() - timedelta(hours=hours_ago))
+    return post
+
+
+class TestTrending:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_incremental_matches_rebuild(self, user, post):
+        for text in ('Первый', 'Второй', 'Третий'):
+            Comment.objects.create(post=post, author=user, text=text)
+        incremental = Post.objects.get(pk=post.pk).trending
+        assert trending.rebuild() == 0, \
+            'Проверьте, что оценка при комментариях совпадает с пересчётом'
+        assert Post.objects.get(pk=post.pk).trending == \
+            pytest.approx(incremental)
+
+        Comment.objects.filter(text='Первый').delete()
+        assert Post.objects.get(pk=post.pk).trending < incremental
+
+    @pytest.mark.django_db(transaction=True)
+    def test_score_inserted_with_post(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(text='Новый пост', author=user)
+        assert not [q for q in queries if 'SET "trending"' in q['sql']], \
+            'Проверьте, что оценка записывается вместе с INSERT поста'
+        assert Post.objects.get(pk=post.pk).trending == \
+            pytest.approx(post.trending)
+        assert trending.rebuild() == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_decayed_order(self, user):
+        old = publish(user, 'Старый обсуждаемый', hours_ago=48)
+        fresh = publish(user, 'Свежий', hours_ago=1)
+        forgotten = publish(user, 'Старый забытый', hours_ago=48)
+        for i in range(5):
+            Comment.objects.create(post=old, author=user, text=f'Ответ {i}')
+        call_command('rebuild_trending')
+        ranked = list(Post.objects.order_by(*trending.ORDERING))
+        assert ranked == [old, fresh, forgotten], \
+            'Проверьте, что свежие комментарии поднимают старый пост'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages(self, client, user, group):
+        for i in range(12):
+            publish(user, f'Пост {i}', hours_ago=i,
+                    group=group if i % 2 else None)
+        trending.rebuild()
+        cache.clear()
+        response = client.get('/trending/')
+        page = response.context['page']
+        assert [p.text for p in page] == [f'Пост {i}' for i in range(10)]
+        rest = client.get(f'/trending/?after={page.next_cursor}')
+        assert [p.text for p in rest.context['page']] == ['Пост 10', 'Пост 11']
+
+        response = client.get(f'/group/{group.slug}/trending/')
+        assert [p.text for p in response.context['page']] == \
+            [f'Пост {i}' for i in range(1, 12, 2)], \
+            'Проверьте, что популярное группы содержит только её посты'
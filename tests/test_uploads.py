@@ -0,0 +1,58 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from posts import thumbnails, uploads
+from posts.models import Post
+
+
+def upload(name='photo.jpg', size=(300, 200), image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'blue').save(buffer, format=image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@pytest.fixture
+def media(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(thumbnails, 'WORKERS', 0)
+    monkeypatch.setattr(thumbnails, 'schedule', lambda post: None)
+
+
+class TestImageUpload:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rejects_non_image_before_decoding(self, user_client, media):
+        fake = SimpleUploadedFile('doc.jpg', b'%PDF-1.4 not an image')
+        response = user_client.post('/new/', {'text': 'Пост', 'image': fake})
+        assert response.status_code == 200
+        assert 'image' in response.context['form'].errors
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rejects_large_files_and_pixels(self, user_client, media,
+                                            monkeypatch):
+        monkeypatch.setattr(uploads, 'MAX_BYTES', 100)
+        response = user_client.post('/new/', {'text': 'Пост',
+                                              'image': upload()})
+        assert response.context['form'].has_error('image', 'too_large'), \
+            'Проверьте, что о слишком большом файле сообщается именно так'
+
+        monkeypatch.setattr(uploads, 'MAX_BYTES', 10 * 1024 * 1024)
+        monkeypatch.setattr(uploads, 'MAX_PIXELS', 1000)
+        response = user_client.post('/new/', {'text': 'Пост',
+                                              'image': upload()})
+        assert 'image' in response.context['form'].errors
+        assert not Post.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_oversized_original_is_downsized(self, user_client, media,
+                                             monkeypatch):
+        monkeypatch.setattr(uploads, 'MAX_EDGE', 150)
+        user_client.post('/new/', {'text': 'Большая', 'image': upload()})
+        post = Post.objects.get(text='Большая')
+        with Image.open(post.image.path) as image:
+            assert image.size == (150, 100), \
+                'Проверьте, что слишком большие картинки уменьшаются при загрузке'
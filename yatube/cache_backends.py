@@ -0,0 +1,346 @@
+"""
+Бэкенды кэша.
+
+SQLiteCache хранит записи в отдельном файле SQLite и подходит, когда все
+воркеры работают на одной машине. Раз в CULL_EVERY записей он удаляет
+истёкшие записи, а если их всё ещё больше MAX_ENTRIES — ещё 1/CULL_FREQUENCY
+самых скоро истекающих, как стандартный бэкенд Django в базе. RedisCache говорит с сервером по
+протоколу RESP напрямую через сокет, без сторонних библиотек.
+LocMemCache и FileBasedCache — стандартные бэкенды Django. Все они
+сообщают о попаданиях и промахах в yatube.metrics.
+"""
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.core.cache.backends import filebased, locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from yatube import metrics
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """
+    Считает попадания и промахи get и get_many. Экземпляр бэкенда у
+    каждого потока свой, поэтому флаг вложенного вызова можно хранить
+    прямо в нём: get_many по умолчанию вызывает get для каждого ключа.
+    """
+    _in_get_many = False
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if not self._in_get_many:
+            metrics.record_cache(hits=int(value is not _MISSING),
+                                 misses=int(value is _MISSING))
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        self._in_get_many = True
+        try:
+            found = super().get_many(keys, version=version)
+        finally:
+            self._in_get_many = False
+        metrics.record_cache(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    pass
+
+
+class _SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._cull_every = params.get('OPTIONS', {}).get('CULL_EVERY', 100)
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.connection = connection
+        return connection
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % self._cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE expires < ?',
+                           (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        # бессрочные ключи (версии пространств имён) удаляются последними
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (max(count // self._cull_frequency, count - self._max_entries),))
+
+    def _expires(self, timeout):
+        # get_backend_timeout возвращает момент истечения, а не интервал
+        return self.get_backend_timeout(timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE key = ? AND expires < ?',
+            (key, time.time()))
+        cursor = connection.execute(
+            'INSERT OR IGNORE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, pickle.dumps(value), self._expires(timeout)))
+        self._written()
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires >= ?)',
+            (key, time.time())).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (key, pickle.dumps(value), self._expires(timeout)))
+        self._written()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (self._expires(timeout), key))
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        # BEGIN IMMEDIATE берёт блокировку записи сразу, поэтому
+        # чтение и запись нового значения атомарны между процессами
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires >= ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value), key))
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # соединения живут в потоках и переиспользуются между запросами
+        pass
+
+
+class RedisError(Exception):
+    pass
+
+
+class _RedisCache(BaseCache):
+    """
+    Минимальный клиент Redis: только команды, нужные интерфейсу кэша
+    Django. Целые числа хранятся как есть, чтобы работал INCRBY,
+    остальные значения — в pickle.
+    """
+    # проверка и увеличение одним скриптом: между EXISTS и INCRBY ключ
+    # может истечь, и INCRBY создал бы его заново без срока жизни
+    INCR_SCRIPT = (
+        "if redis.call('EXISTS', KEYS[1]) == 1 then "
+        "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+        "return false"
+    )
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        self._address = (url.hostname or '127.0.0.1', url.port or 6379)
+        self._db = int(url.path.lstrip('/') or 0)
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1)
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self._address, self._socket_timeout)
+        self._local.socket = sock
+        self._local.file = sock.makefile('rb')
+        if self._db:
+            self._call('SELECT', self._db)
+
+    def _call(self, *args):
+        if getattr(self._local, 'socket', None) is None:
+            self._connect()
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        try:
+            self._local.socket.sendall(b''.join(parts))
+            return self._read()
+        except (OSError, EOFError):
+            self._local.socket = None
+            raise
+
+    def _read(self):
+        line = self._local.file.readline()
+        if not line:
+            raise EOFError('connection closed')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._local.file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError(f'unexpected reply {line!r}')
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value)
+
+    @staticmethod
+    def _decode(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _ttl_ms(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return None
+        return max(int((expires - time.time()) * 1000), 1)
+
+    def _expiry_args(self, timeout):
+        ttl = self._ttl_ms(timeout)
+        return () if ttl is None else ('PX', ttl)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        reply = self._call('SET', key, self._encode(value),
+                           *self._expiry_args(timeout), 'NX')
+        return reply == 'OK'
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._call('GET', key)
+        return default if data is None else self._decode(data)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self.make_key(key, version=version): key for key in keys}
+        values = self._call('MGET', *made)
+        return {made[key]: self._decode(data)
+                for key, data in zip(made, values) if data is not None}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._call('SET', key, self._encode(value),
+                   *self._expiry_args(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        ttl = self._ttl_ms(timeout)
+        if ttl is None:
+            return self._call('PERSIST', key) == 1 or self.has_key(key)
+        return self._call('PEXPIRE', key, ttl) == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._call('DEL', key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        return self._call('EXISTS', key) == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._call('EVAL', self.INCR_SCRIPT, 1, key, delta)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self._call('FLUSHDB')
+
+    def close(self, **kwargs):
+        pass
+
+
+class SQLiteCache(InstrumentedCacheMixin, _SQLiteCache):
+    pass
+
+
+class RedisCache(InstrumentedCacheMixin, _RedisCache):
+    pass
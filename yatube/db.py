@@ -0,0 +1,28 @@
+"""
+Настройка соединений SQLite.
+
+Прагмы из settings.SQLITE_PRAGMAS выполняются на каждом новом
+соединении (сигнал connection_created, подключается в
+posts.apps.PostsConfig.ready). Профили прагм описаны в settings.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # напрямую через sqlite3, минуя обёртки Django: прагмы — не запросы
+    # страницы и не должны попадать в метрики и бюджеты
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def pragmas(connection):
+    """
+    Текущие значения прагм из SQLITE_PRAGMAS — для проверки и отчётов.
+    """
+    connection.ensure_connection()
+    return {
+        name: connection.connection.execute(f'PRAGMA {name}').fetchone()[0]
+        for name in getattr(settings, 'SQLITE_PRAGMAS', {})
+    }
@@ -0,0 +1,166 @@
+"""
+Метрики запросов: время ответа, запросы к базе, рендеринг шаблонов,
+попадания и промахи кэша.
+
+Замеры текущего запроса лежат в contextvar, который заполняет
+yatube.middleware.PerformanceMiddleware. Бэкенды шаблонов и кэша
+вызывают record_*; вне запроса (команды, фоновые потоки) это ничего
+не делает. Итоги копятся в памяти процесса и отдаются view metrics
+в текстовом формате Prometheus.
+"""
+import hmac
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# границы корзин гистограммы времени ответа, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_current = ContextVar('yatube_request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def record_query(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.db_time += duration
+
+
+def record_template(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.template_time += duration
+
+
+def record_cache(hits=0, misses=0):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class Registry:
+    """
+    Накопленные по view счётчики и гистограмма времени ответа.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.requests = defaultdict(int)
+        self.buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self.duration = defaultdict(float)
+        self.counters = defaultdict(float)
+
+    def observe(self, view, method, status, metrics, elapsed):
+        with self._lock:
+            self.requests[(view, method, status)] += 1
+            self.duration[view] += elapsed
+            buckets = self.buckets[view]
+            for i, bound in enumerate(BUCKETS):
+                if elapsed <= bound:
+                    buckets[i] += 1
+            for name, value in (
+                    ('db_queries_total', metrics.queries),
+                    ('db_duration_seconds_total', metrics.db_time),
+                    ('template_duration_seconds_total',
+                     metrics.template_time),
+                    ('cache_hits_total', metrics.cache_hits),
+                    ('cache_misses_total', metrics.cache_misses)):
+                self.counters[(name, view)] += value
+
+    def budget_exceeded(self, view, kind):
+        with self._lock:
+            self.counters[('budget_exceeded_total', view, kind)] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append('# TYPE yatube_requests_total counter')
+            for (view, method, status), count in sorted(
+                    self.requests.items()):
+                lines.append(
+                    f'yatube_requests_total{{view="{view}",'
+                    f'method="{method}",status="{status}"}} {count}')
+            lines.append(
+                '# TYPE yatube_request_duration_seconds histogram')
+            for view, buckets in sorted(self.buckets.items()):
+                label = f'view="{view}"'
+                for bound, count in zip(BUCKETS, buckets):
+                    lines.append(
+                        f'yatube_request_duration_seconds_bucket'
+                        f'{{{label},le="{bound}"}} {count}')
+                total = sum(count for (name, _, _), count
+                            in self.requests.items() if name == view)
+                lines.append(f'yatube_request_duration_seconds_bucket'
+                             f'{{{label},le="+Inf"}} {total}')
+                lines.append(f'yatube_request_duration_seconds_sum'
+                             f'{{{label}}} {self.duration[view]:.6f}')
+                lines.append(f'yatube_request_duration_seconds_count'
+                             f'{{{label}}} {total}')
+            names = sorted({key[0] for key in self.counters})
+            for name in names:
+                lines.append(f'# TYPE yatube_{name} counter')
+                for key, value in sorted(self.counters.items()):
+                    if key[0] != name:
+                        continue
+                    labels = f'view="{key[1]}"'
+                    if len(key) > 2:
+                        labels += f',kind="{key[2]}"'
+                    lines.append(f'yatube_{name}{{{labels}}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _allowed(request):
+    if request.user.is_staff:
+        return True
+    if request.META.get('REMOTE_ADDR') in getattr(
+            settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode())
+
+
+def metrics(request):
+    """
+    Метрики процесса в формате Prometheus. Доступны персоналу, с адресов
+    из METRICS_ALLOWED_IPS и по токену METRICS_TOKEN.
+    """
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
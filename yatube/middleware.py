@@ -0,0 +1,122 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from yatube import metrics, routers
+
+logger = logging.getLogger('yatube.perf')
+
+
+class PerformanceBudgetExceeded(AssertionError):
+    pass
+
+
+def _query_timer(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(time.perf_counter() - started)
+
+
+class PerformanceMiddleware:
+    """
+    Замеряет каждый запрос: общее время, число и время запросов к базе,
+    время рендеринга шаблонов, попадания и промахи кэша. Итоги уходят
+    в заголовок Server-Timing и в yatube.metrics.registry.
+
+    PERF_BUDGETS задаёт пределы по имени view: {'index': {'queries': 10,
+    'time_ms': 300}}, ключ '*' — для остальных. О превышении пишется в
+    лог yatube.perf. При PERF_BUDGET_ACTION = 'raise' превышение числа
+    запросов поднимает исключение — так тесты падают на N+1. Время
+    ответа зависит от машины, поэтому оно только логируется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current, token = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_query_timer))
+                response = self.get_response(request)
+            elapsed = current.elapsed
+        finally:
+            metrics.finish(token)
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if view == 'metrics':
+            return response
+        metrics.registry.observe(view, request.method,
+                                 response.status_code, current, elapsed)
+        response['Server-Timing'] = self.server_timing(current, elapsed)
+        self.check_budget(view, current, elapsed)
+        return response
+
+    @staticmethod
+    def server_timing(current, elapsed):
+        return ', '.join([
+            f'total;dur={elapsed * 1000:.1f}',
+            f'db;dur={current.db_time * 1000:.1f};'
+            f'desc="{current.queries} queries"',
+            f'tpl;dur={current.template_time * 1000:.1f}',
+            f'cache;desc="hit {current.cache_hits}, '
+            f'miss {current.cache_misses}"',
+        ])
+
+    def check_budget(self, view, current, elapsed):
+        budgets = getattr(settings, 'PERF_BUDGETS', {})
+        budget = budgets.get(view, budgets.get('*'))
+        if not budget:
+            return
+        if current.queries > budget.get('queries', float('inf')):
+            metrics.registry.budget_exceeded(view, 'queries')
+            message = (f'{view}: {current.queries} запросов к базе '
+                       f'при бюджете {budget["queries"]}')
+            if getattr(settings, 'PERF_BUDGET_ACTION', 'log') == 'raise':
+                raise PerformanceBudgetExceeded(message)
+            logger.warning(message)
+        elapsed_ms = elapsed * 1000
+        if elapsed_ms > budget.get('time_ms', float('inf')):
+            metrics.registry.budget_exceeded(view, 'time')
+            logger.warning(f'{view}: {elapsed_ms:.0f} мс '
+                           f'при бюджете {budget["time_ms"]} мс')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Отправляет чтение страниц из REPLICA_VIEWS на реплику
+    (см. yatube/routers.py). После записи в основную базу клиент
+    получает куку REPLICA_STICKY_COOKIE и REPLICA_STICKY_SECONDS читает
+    из основной базы — так он сразу видит свои изменения, даже если
+    реплика ещё не догнала.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state, token = routers.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish(token)
+        if state.wrote and getattr(settings, 'DATABASE_REPLICAS', ()):
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = f'{view_func.__module__}.{view_func.__name__}'
+        if (request.method in ('GET', 'HEAD')
+                and view in settings.REPLICA_VIEWS
+                and settings.REPLICA_STICKY_COOKIE not in request.COOKIES):
+            routers.use_replica()
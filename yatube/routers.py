@@ -0,0 +1,70 @@
+"""
+Чтение с реплик базы.
+
+Реплики — копии основной базы только для чтения, перечисленные в
+settings.DATABASE_REPLICAS; копирование файлов происходит вне
+приложения. Какие запросы читают с реплики, решает
+yatube.middleware.ReplicaRoutingMiddleware: только GET и HEAD к view из
+settings.REPLICA_VIEWS. Всё остальное — записи, команды, фоновые
+потоки — работает с основной базой.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_current = ContextVar('yatube_db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        # реплика, с которой читает текущий запрос, или None
+        self.replica = None
+        # запрос что-то записал в основную базу
+        self.wrote = False
+
+
+def start():
+    state = RoutingState()
+    return state, _current.set(state)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def use_replica():
+    state = _current.get()
+    replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+    if state is not None and replicas:
+        # одна реплика на весь запрос, чтобы данные были согласованы
+        state.replica = random.choice(replicas)
+
+
+def reading_replica():
+    state = _current.get()
+    return state is not None and state.replica is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is not None and state.replica is not None:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', ()):
+            return False
+        return None
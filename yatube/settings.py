@@ -22,7 +22,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '6*9hq6dj-!*e^l&f)b7p2sbs4kw*=+3l3dl(=z&zv+=4c#z1^q'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     "localhost",
@@ -46,10 +46,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
+    'rest_framework',
+    'api',
 
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы замер включал все остальные middleware
+    'yatube.middleware.PerformanceMiddleware',
+    # до сессий и авторизации, чтобы видеть и их записи в базу
+    'yatube.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +67,22 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # в бою шаблоны читаются и разбираются один раз на процесс
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для метрик
+        'BACKEND': 'yatube.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR, ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -83,13 +99,78 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Прагмы SQLite для каждого соединения (см. yatube/db.py). 'tuned'
+# включает WAL — читатели не ждут писателей, — synchronous=NORMAL,
+# отображение файла в память, большой кэш страниц и ожидание снятия
+# блокировки вместо мгновенной ошибки «database is locked».
+# journal_mode хранится в самом файле базы, поэтому 'default' явно
+# возвращает режим DELETE.
+SQLITE_PROFILES = {
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+    },
+    'tuned': {
+        'journal_mode': 'WAL',
+        # в режиме WAL NORMAL не нарушает целостность базы при сбое,
+        # теряются только последние транзакции при отключении питания
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # отрицательное значение — размер в КиБ
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+}
+SQLITE_PROFILE = os.environ.get('YATUBE_SQLITE',
+                                'default' if DEBUG else 'tuned')
+SQLITE_PRAGMAS = SQLITE_PROFILES[SQLITE_PROFILE]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # постоянные соединения: прагмы и кэш страниц не пропадают
+        # между запросами
+        'CONN_MAX_AGE': int(os.environ.get(
+            'YATUBE_CONN_MAX_AGE', 0 if SQLITE_PROFILE == 'default' else 600)),
     }
 }
 
+# Реплики только для чтения: пути к копиям файла базы через запятую.
+# Файлы копирует внешний инструмент (например, litestream), без реплик
+# всё читается из default. См. yatube/routers.py.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': name,
+        # в тестах реплика — та же база, что и default
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+
+# view, которые читают с реплик (полные пути к функциям)
+REPLICA_VIEWS = [
+    'posts.views.index',
+    'posts.views.group_posts',
+    'posts.views.profile',
+    'posts.views.post_view',
+    'posts.views.follow_index',
+    'posts.views.search_posts',
+    'posts.views.trending_posts',
+    'posts.views.group_trending',
+    'django.contrib.flatpages.views.flatpage',
+]
+# после записи клиент столько секунд читает из основной базы
+REPLICA_STICKY_COOKIE = 'yatube_primary'
+REPLICA_STICKY_SECONDS = 10
+# страницы, собранные с реплики, могут отставать — кэшируем их недолго
+REPLICA_PAGE_CACHE_TIMEOUT = 60
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -130,6 +211,15 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# Сколько фоновых потоков строят миниатюры; 0 — строить синхронно
+THUMBNAIL_WORKERS = 2
+
+# Загрузки пишутся на диск по частям и проверяются до декодирования
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_MAX_EDGE = 2560
+
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 # LOGOUT_REDIRECT_URL = "index"
@@ -141,10 +231,86 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 SITE_ID = 1
 
+# Бэкенд кэша выбирается переменной окружения YATUBE_CACHE:
+# locmem — у каждого процесса свой кэш (по умолчанию),
+# file, sqlite — общий кэш процессов на одной машине,
+# redis — общий кэш на сервере Redis (адрес в YATUBE_CACHE_LOCATION).
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'yatube.cache_backends.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'yatube.cache_backends.FileBasedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   os.path.join(BASE_DIR, 'cache')),
+    },
+    'sqlite': {
+        'BACKEND': 'yatube.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   os.path.join(BASE_DIR, 'cache.sqlite3')),
+        # старые версии страниц вытесняются, когда записей больше
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    'redis': {
+        'BACKEND': 'yatube.cache_backends.RedisCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   'redis://127.0.0.1:6379/0'),
+    },
+}
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+
+# Страницы кэшируются с версиями и сбрасываются сигналами моделей,
+# поэтому время жизни может быть большим (см. posts/caching.py)
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Приём комментариев: 'sync' — сразу в базу, 'queue' — в отдельный файл
+# очереди, откуда их порциями переносит в базу фоновый поток или
+# команда drain_comments (см. posts/comment_queue.py).
+COMMENT_INGESTION = os.environ.get('YATUBE_COMMENT_INGESTION', 'sync')
+COMMENT_QUEUE_PATH = os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+# раз в сколько секунд фоновый поток переносит очередь;
+# None — только командой drain_comments
+COMMENT_DRAIN_INTERVAL = 1.0
+
+# Популярное: через сколько секунд вклад поста или комментария в оценку
+# уменьшается вдвое (см. posts/trending.py)
+TRENDING_HALF_LIFE = 60 * 60 * 24
+
+# Движок полнотекстового поиска по постам. FTS5 встроен в SQLite,
+# для других баз есть запасной posts.search.backends.SimpleBackend.
+SEARCH_BACKEND = 'posts.search.backends.FTS5Backend'
+
+# Пределы на запрос по имени view (см. yatube/middleware.py).
+# '*' действует для всех view, которых нет в списке.
+PERF_BUDGETS = {
+    'index': {'queries': 10, 'time_ms': 300},
+    'group_posts': {'queries': 10, 'time_ms': 300},
+    'profile': {'queries': 12, 'time_ms': 300},
+    'post': {'queries': 12, 'time_ms': 300},
+    'follow_index': {'queries': 12, 'time_ms': 300},
+    'search': {'queries': 10, 'time_ms': 500},
+    'trending': {'queries': 10, 'time_ms': 300},
+    'group_trending': {'queries': 10, 'time_ms': 300},
+    '*': {'time_ms': 1000},
+}
+# 'log' — писать о превышении в лог, 'raise' — поднимать исключение
+PERF_BUDGET_ACTION = os.environ.get('YATUBE_PERF_BUDGET_ACTION', 'log')
+
+# Доступ к метрикам /admin/metrics/: адреса клиентов (за обратным прокси
+# все запросы приходят с 127.0.0.1, поэтому по умолчанию список пуст)
+# и токен для заголовка «Authorization: Bearer <токен>». Персоналу
+# метрики доступны всегда.
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('YATUBE_METRICS_IPS', '').split(',') if ip]
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+
+REST_FRAMEWORK = {
+    # только JSON: ETag ответа не учитывает заголовок Accept
+    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer',),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
 }
 
 TEST_CACHES = {
@@ -19,9 +19,11 @@ from django.urls import path, include
 from django.contrib.flatpages import views
 from django.conf.urls import handler404, handler500
 
-from yatube import settings
+from yatube import metrics, settings
 
 urlpatterns = [
+    # до admin.site.urls и вне '<username>/', чтобы не занимать имя
+    path('admin/metrics/', metrics.metrics, name='metrics'),
     path('admin/', admin.site.urls),
     # flatpages
     path('about/', include('django.contrib.flatpages.urls')),
@@ -30,6 +32,8 @@ urlpatterns = [
     #  если нужного шаблона для /auth не нашлось в файле users.urls —
     #  ищем совпадения в файле django.contrib.auth.urls
     path("auth/", include("django.contrib.auth.urls")),
+    # API для мобильного клиента, до posts.urls, где '<username>/'
+    path('api/', include('api.urls')),
     path('', include('posts.urls')),
 
 ]